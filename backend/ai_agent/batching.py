@@ -0,0 +1,153 @@
+"""
+Dynamic micro-batching for local Hugging Face inference.
+
+A text-generation pipeline handles one prompt per call, so concurrent requests
+queue behind each other on the GPU. MicroBatcher collects the prompts that
+arrive within a few milliseconds of each other (or until the batch is full),
+runs them through a single padded `generate` call and routes each completion
+back to the request that submitted it.
+"""
+import asyncio
+from concurrent.futures import Executor
+from typing import Any, Callable, List, Optional, Tuple
+
+
+def generate_batch(tokenizer: Any, model: Any, prompts: List[str], max_new_tokens: int, **generate_kwargs: Any) -> List[str]:
+    """
+    Generate completions for several prompts with one padded `generate` call.
+
+    Args:
+        tokenizer: Hugging Face tokenizer for the model
+        model: Causal language model
+        prompts: Prompts to complete
+        max_new_tokens: Maximum number of tokens to generate per prompt
+        **generate_kwargs: Extra arguments passed to `model.generate`
+
+    Returns:
+        The generated text for each prompt, without the prompt itself
+    """
+    import torch
+
+    # Decoder-only models must be padded on the left so generation continues each prompt
+    tokenizer.padding_side = "left"
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+
+    inputs = tokenizer(prompts, return_tensors="pt", padding=True).to(model.device)
+    with torch.inference_mode():
+        output = model.generate(
+            **inputs,
+            max_new_tokens=max_new_tokens,
+            pad_token_id=tokenizer.pad_token_id,
+            **generate_kwargs
+        )
+
+    new_tokens = output[:, inputs["input_ids"].shape[1]:]
+    return tokenizer.batch_decode(new_tokens, skip_special_tokens=True)
+
+
+class MicroBatcher:
+    """Group concurrent prompts into batches for a blocking batch generate function."""
+
+    def __init__(
+        self,
+        generate: Callable[[List[str]], List[str]],
+        max_batch_size: int,
+        max_wait_ms: float,
+        executor: Optional[Executor] = None
+    ):
+        """
+        Args:
+            generate: Blocking function mapping a list of prompts to their completions
+            max_batch_size: Largest number of prompts run in one call
+            max_wait_ms: How long the first prompt of a batch waits for company
+            executor: Executor the blocking generate call runs on (default executor if None)
+        """
+        self.generate = generate
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self.executor = executor
+        self._pending: List[Tuple[str, "asyncio.Future[str]"]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional["asyncio.Task[None]"] = None
+        self.batches = 0
+        self.prompts = 0
+
+    async def submit(self, prompt: str) -> str:
+        """Queue a prompt and wait for its completion."""
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._worker = loop.create_task(self._run())
+
+        future: "asyncio.Future[str]" = loop.create_future()
+        self._pending.append((prompt, future))
+        self._wakeup.set()
+        return await future
+
+    async def close(self) -> None:
+        """Stop the batching loop, failing any prompts still queued."""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        for _, future in self._pending:
+            if not future.done():
+                future.set_exception(RuntimeError("Micro-batcher closed"))
+        self._pending = []
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._wakeup.wait()
+            if not self._pending:
+                self._wakeup.clear()
+                continue
+
+            # Hold the batch open until it fills up or the first prompt has waited long enough
+            deadline = loop.time() + self.max_wait
+            while len(self._pending) < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+
+            batch = self._pending[:self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size:]
+            if not self._pending:
+                self._wakeup.clear()
+
+            # Callers that went away don't need a slot in the batch
+            batch = [(prompt, future) for prompt, future in batch if not future.done()]
+            if not batch:
+                continue
+
+            self.batches += 1
+            self.prompts += len(batch)
+            try:
+                outputs = await loop.run_in_executor(self.executor, self.generate, [prompt for prompt, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), output in zip(batch, outputs):
+                if not future.done():
+                    future.set_result(output)
+
+    def stats(self) -> dict:
+        """Counters for the achieved batch size."""
+        return {
+            "queued": len(self._pending),
+            "batches": self.batches,
+            "prompts": self.prompts,
+            "mean_batch_size": self.prompts / self.batches if self.batches else 0.0,
+        }
@@ -0,0 +1,136 @@
+"""
+Two-tier cache for journal analyses.
+
+Entries are keyed on a hash of the normalized journal text plus the provider and
+model, so trivially different entries ("Today was fine." / "today was fine") share
+one LLM round trip. The first tier is an in-process LRU with a TTL; the second is
+a MongoDB collection with a TTL index, shared by every uvicorn worker.
+"""
+import logging
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from ai_agent.pydantic_types import JournalAnalysis
+from build_dataset.utils import unique_id
+from config import settings
+from models.analysis_cache import CachedAnalysis
+
+logger = logging.getLogger(__name__)
+
+# Sentence punctuation that does not change what an entry says
+_TRAILING_PUNCTUATION = ".!?…。 "
+
+
+def normalize_journal_text(journal_text: str) -> str:
+    """Normalize unicode, case, whitespace and trailing punctuation of a journal entry."""
+    text = unicodedata.normalize("NFKC", journal_text).casefold()
+    text = " ".join(text.split())
+    return text.rstrip(_TRAILING_PUNCTUATION)
+
+
+def analysis_cache_key(journal_text: str, provider: str, model: str) -> str:
+    """Build the cache key for an entry analysed by a given provider and model."""
+    return unique_id(f"{provider}\0{model}\0{normalize_journal_text(journal_text)}")
+
+
+class AnalysisCache:
+    """In-process LRU with TTL in front of a MongoDB TTL collection."""
+
+    def __init__(self, max_entries: int, ttl_seconds: int, use_mongo: bool = True):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.use_mongo = use_mongo
+        self._entries: "OrderedDict[str, Tuple[float, JournalAnalysis]]" = OrderedDict()
+        self.memory_hits = 0
+        self.mongo_hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> Optional[JournalAnalysis]:
+        """Look up an analysis, promoting Mongo hits into the in-process tier."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, analysis = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return analysis
+            del self._entries[key]
+
+        if self.use_mongo:
+            try:
+                cached = await CachedAnalysis.find_one({"key": key})
+            except Exception as e:
+                logger.warning(f"Analysis cache lookup failed: {e}")
+                cached = None
+            # The TTL monitor only runs once a minute, so check expiry here as well
+            if cached is not None and cached.expires_at > datetime.utcnow():
+                analysis = JournalAnalysis(
+                    mood=cached.mood,
+                    mood_score=cached.mood_score,
+                    questions=cached.questions
+                )
+                remaining = (cached.expires_at - datetime.utcnow()).total_seconds()
+                self._remember(key, analysis, remaining)
+                self.mongo_hits += 1
+                return analysis
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, analysis: JournalAnalysis, provider: str, model: str) -> None:
+        """Store an analysis in both tiers."""
+        self._remember(key, analysis, self.ttl_seconds)
+
+        if self.use_mongo:
+            now = datetime.utcnow()
+            fields = {
+                "provider": provider,
+                "model": model,
+                "mood": analysis.mood,
+                "mood_score": analysis.mood_score,
+                "questions": analysis.questions,
+                "created_at": now,
+                "expires_at": now + timedelta(seconds=self.ttl_seconds),
+            }
+            try:
+                await CachedAnalysis.find_one({"key": key}).upsert(
+                    {"$set": fields},
+                    on_insert=CachedAnalysis(key=key, **fields)
+                )
+            except Exception as e:
+                logger.warning(f"Analysis cache write failed: {e}")
+
+    def clear(self) -> None:
+        """Drop the in-process tier and reset the counters."""
+        self._entries.clear()
+        self.memory_hits = self.mongo_hits = self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for sizing the cache."""
+        hits = self.memory_hits + self.mongo_hits
+        lookups = hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "memory_hits": self.memory_hits,
+            "mongo_hits": self.mongo_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+    def _remember(self, key: str, analysis: JournalAnalysis, ttl_seconds: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl_seconds, analysis)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+analysis_cache = AnalysisCache(
+    max_entries=settings.ANALYSIS_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.ANALYSIS_CACHE_TTL_SECONDS,
+    use_mongo=settings.ANALYSIS_CACHE_MONGO_ENABLED
+)
@@ -1,25 +1,141 @@
-from typing import Optional, Union, Dict, Any, List
+import threading
+from importlib.util import find_spec
+from typing import TYPE_CHECKING, Optional, Union, Dict, Any, List, Tuple, Iterable
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.language_models import BaseLLM
 from langchain_core.messages import BaseMessage
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import Runnable
-from langchain_openai import ChatOpenAI
-from langchain_ollama.llms import OllamaLLM
 from config import settings, ModelProvider
 
-# Import Hugging Face components conditionally to avoid import errors if not installed
-try:
-    from langchain_huggingface import HuggingFacePipeline
-    from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
-    HUGGINGFACE_AVAILABLE = True
-except ImportError:
-    HUGGINGFACE_AVAILABLE = False
+# Provider backends are imported inside their create_* function, so a worker only
+# pays the import time and memory of the provider it actually uses (transformers
+# and torch alone add seconds and hundreds of MB).
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+    from langchain_ollama.llms import OllamaLLM
+
+
+def huggingface_available() -> bool:
+    """Whether the Hugging Face dependencies are installed, checked without importing them."""
+    return all(find_spec(module) is not None for module in ("transformers", "langchain_huggingface"))
+
+# Process-wide registry of model clients, keyed by provider and the settings
+# that shape the client. Filled once during the FastAPI lifespan and reused by
+# every request so that the per-request cost is inference only.
+_LLM_REGISTRY: Dict[Tuple[Any, ...], BaseLLM] = {}
+_LLM_REGISTRY_LOCK = threading.Lock()
+
+
+def resolve_provider(model_provider: Optional[Union[ModelProvider, str]] = None) -> ModelProvider:
+    """
+    Resolve a provider override (enum or plain string) to a ModelProvider.
+
+    Args:
+        model_provider: Override the model provider from settings. If None, uses the configured provider.
+
+    Returns:
+        ModelProvider: The provider to use.
+    """
+    return ModelProvider(model_provider) if model_provider else settings.MODEL_PROVIDER
 
 
-def create_llm(model_provider: Optional[ModelProvider] = None) -> BaseLLM:
+def llm_model_name(model_provider: Optional[Union[ModelProvider, str]] = None) -> str:
+    """
+    Get the configured model name for a provider.
+
+    Args:
+        model_provider: Override the model provider from settings. If None, uses the configured provider.
+
+    Returns:
+        str: The model name or Hugging Face model ID.
+    """
+    provider = resolve_provider(model_provider)
+
+    if provider == ModelProvider.OPENAI:
+        return settings.OPENAI_MODEL
+    elif provider == ModelProvider.HUGGINGFACE:
+        return settings.HUGGINGFACE_MODEL_ID
+    elif provider == ModelProvider.OLLAMA:
+        return settings.OLLAMA_MODEL
+    else:
+        raise ValueError(f"Unsupported model provider: {provider}")
+
+
+def llm_registry_key(model_provider: Optional[Union[ModelProvider, str]] = None) -> Tuple[Any, ...]:
+    """
+    Build the registry key for a provider from the settings that affect its client.
+
+    Args:
+        model_provider: Override the model provider from settings. If None, uses the configured provider.
+
+    Returns:
+        Tuple: A hashable key identifying the client configuration.
+    """
+    provider = resolve_provider(model_provider)
+
+    if provider == ModelProvider.OPENAI:
+        return (provider.value, settings.OPENAI_MODEL)
+    elif provider == ModelProvider.HUGGINGFACE:
+        return (
+            provider.value,
+            settings.HUGGINGFACE_MODEL_ID,
+            settings.HUGGINGFACE_LOAD_IN_4BIT,
+            settings.HUGGINGFACE_DEVICE_MAP,
+            settings.HUGGINGFACE_MAX_NEW_TOKENS,
+        )
+    elif provider == ModelProvider.OLLAMA:
+        return (provider.value, settings.OLLAMA_BASE_URL, settings.OLLAMA_MODEL)
+    else:
+        raise ValueError(f"Unsupported model provider: {provider}")
+
+
+def get_llm(model_provider: Optional[Union[ModelProvider, str]] = None) -> BaseLLM:
+    """
+    Get the shared language model instance for a provider, building it on first use.
+
+    Args:
+        model_provider: Override the model provider from settings. If None, uses the configured provider.
+
+    Returns:
+        BaseLLM: The shared language model instance.
+    """
+    key = llm_registry_key(model_provider)
+    llm = _LLM_REGISTRY.get(key)
+    if llm is not None:
+        return llm
+
+    # Build under the lock so concurrent first calls don't load the model twice
+    with _LLM_REGISTRY_LOCK:
+        llm = _LLM_REGISTRY.get(key)
+        if llm is None:
+            llm = create_llm(model_provider)
+            _LLM_REGISTRY[key] = llm
+    return llm
+
+
+def init_llm_registry(model_providers: Optional[Iterable[Union[ModelProvider, str]]] = None) -> None:
+    """
+    Eagerly build the model clients for the given providers.
+
+    Args:
+        model_providers: Providers to warm up. If None, warms the configured provider.
+    """
+    for provider in model_providers or [settings.MODEL_PROVIDER]:
+        get_llm(provider)
+
+
+def clear_llm_registry() -> None:
+    """Drop every shared model client so the next call rebuilds it."""
+    with _LLM_REGISTRY_LOCK:
+        _LLM_REGISTRY.clear()
+
+
+def create_llm(model_provider: Optional[Union[ModelProvider, str]] = None) -> BaseLLM:
     """
     Create a language model instance using the configured settings.
+
+    This always builds a new client; use get_llm to share one across requests.
     
     Args:
         model_provider: Override the model provider from settings. If None, uses the configured provider.
@@ -28,7 +144,7 @@ def create_llm(model_provider: Optional[ModelProvider] = None) -> BaseLLM:
         BaseLLM: A configured language model instance.
     """
     # Determine which model provider to use
-    provider = model_provider if model_provider else settings.MODEL_PROVIDER
+    provider = resolve_provider(model_provider)
     
     if provider == ModelProvider.OPENAI:
         return create_openai_llm()
@@ -40,13 +156,15 @@ def create_llm(model_provider: Optional[ModelProvider] = None) -> BaseLLM:
         raise ValueError(f"Unsupported model provider: {provider}")
 
 
-def create_openai_llm() -> ChatOpenAI:
+def create_openai_llm() -> "ChatOpenAI":
     """
     Create an OpenAI language model instance.
     
     Returns:
         ChatOpenAI: A configured OpenAI language model instance.
     """
+    from langchain_openai import ChatOpenAI
+
     llm = ChatOpenAI(
         model=settings.OPENAI_MODEL,
         temperature=0.6,
@@ -54,13 +172,15 @@ def create_openai_llm() -> ChatOpenAI:
     )
     return llm
 
-def create_ollama_llm() -> ChatOpenAI:
+def create_ollama_llm() -> "OllamaLLM":
     """
     Create an Ollama language model instance.
     
     Returns:
-        ChatOpenAI: A configured Ollama language model instance.
+        OllamaLLM: A configured Ollama language model instance.
     """
+    from langchain_ollama.llms import OllamaLLM
+
     print("Creating Ollama LLM: ", settings.OLLAMA_BASE_URL, settings.OLLAMA_MODEL)
     llm = OllamaLLM(
         model=settings.OLLAMA_MODEL,
@@ -76,11 +196,13 @@ def create_huggingface_llm() -> BaseLLM:
     Returns:
         BaseLLM: A configured Hugging Face language model instance.
     """
-    if not HUGGINGFACE_AVAILABLE:
+    if not huggingface_available():
         raise ImportError(
             "Hugging Face dependencies are not installed. "
             "Install them with 'pip install transformers torch langchain-huggingface'"
         )
+    from langchain_huggingface import HuggingFacePipeline
+    from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
     
     # Load the model and tokenizer
     tokenizer = AutoTokenizer.from_pretrained(settings.HUGGINGFACE_MODEL_ID)
@@ -4,33 +4,31 @@ Journal Analyzer - A tool for analyzing and generating reflective questions from
 This script provides a simple command-line interface to the journal analysis functionality.
 Supports both OpenAI and fine-tuned Hugging Face models.
 """
+import asyncio
+import functools
+import logging
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 from langchain_core.prompts import ChatPromptTemplate
 from utils.helper import extract_json_from_string
+from utils.admission import OverloadedError, get_admission_controller
+from utils.json_stream import StreamingJSONExtractor, JSONStreamEvent
 
 # Add the parent directory to the path so we can import from ai_agent
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from ai_agent.pydantic_types import JournalAnalysis
-from ai_agent.llm import create_llm
+from ai_agent.batching import MicroBatcher, generate_batch
+from ai_agent.cache import analysis_cache, analysis_cache_key
+from ai_agent.llm import get_llm, llm_model_name, resolve_provider
+from config import settings, ModelProvider
 
-def analyze_journal_entry(journal_text: str) -> JournalAnalysis:
-    """
-    Analyze a journal entry to extract mood and generate follow-up questions.
-    
-    Args:
-        journal_text: The journal entry text to analyze
-        
-    Returns:
-        JournalAnalysis object containing mood and questions
-    """
-    try:
-        # llm = create_llm("ollama")
-        llm = create_llm("openai")
+logger = logging.getLogger(__name__)
 
-        # Create the prompt
-        prompt = """Below is an instruction that describes a task, paired with an input that provides further context. Write a response that appropriately completes the request.
+# Prompt used for every analysis request
+ANALYSIS_PROMPT = """Below is an instruction that describes a task, paired with an input that provides further context. Write a response that appropriately completes the request.
 
         ### Instruction:
         Given a journal entry. Generate 5 follow-up questions for the user.
@@ -48,42 +46,283 @@ def analyze_journal_entry(journal_text: str) -> JournalAnalysis:
         ### Response:
         """
 
-        prompt = ChatPromptTemplate.from_template(prompt)
+analysis_prompt = ChatPromptTemplate.from_template(ANALYSIS_PROMPT)
 
-        # Call the LLM
-        model = prompt | llm
-        response = model.invoke({"input": journal_text})
-        if isinstance(response, str):
-            content = response
-        else:
-            content = response.content
+# Local Hugging Face inference is blocking and GPU-bound, so it runs on a small
+# dedicated pool instead of the event loop or the shared default executor.
+_huggingface_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_huggingface_executor() -> ThreadPoolExecutor:
+    """Get the bounded executor used for local Hugging Face inference."""
+    global _huggingface_executor
+    if _huggingface_executor is None:
+        _huggingface_executor = ThreadPoolExecutor(
+            max_workers=settings.HUGGINGFACE_MAX_WORKERS,
+            thread_name_prefix="hf-inference"
+        )
+    return _huggingface_executor
+
+
+def shutdown_huggingface_executor() -> None:
+    """Stop the Hugging Face inference executor, waiting for running calls."""
+    global _huggingface_executor
+    if _huggingface_executor is not None:
+        _huggingface_executor.shutdown(wait=True)
+        _huggingface_executor = None
+
+
+# Concurrent local prompts are grouped into padded batches on the executor above
+_huggingface_batcher: Optional[MicroBatcher] = None
+
+
+def get_huggingface_batcher() -> MicroBatcher:
+    """Get the micro-batcher that runs local Hugging Face prompts in batches."""
+    global _huggingface_batcher
+    if _huggingface_batcher is None:
+        text_gen_pipeline = get_llm(ModelProvider.HUGGINGFACE).pipeline
+        _huggingface_batcher = MicroBatcher(
+            functools.partial(
+                generate_batch,
+                text_gen_pipeline.tokenizer,
+                text_gen_pipeline.model,
+                max_new_tokens=settings.HUGGINGFACE_MAX_NEW_TOKENS
+            ),
+            max_batch_size=settings.HUGGINGFACE_BATCH_MAX_SIZE,
+            max_wait_ms=settings.HUGGINGFACE_BATCH_MAX_WAIT_MS,
+            executor=get_huggingface_executor()
+        )
+    return _huggingface_batcher
+
+
+async def close_huggingface_batcher() -> None:
+    """Stop the Hugging Face micro-batcher."""
+    global _huggingface_batcher
+    if _huggingface_batcher is not None:
+        await _huggingface_batcher.close()
+        _huggingface_batcher = None
+
+
+def huggingface_batcher_stats() -> Optional[Dict[str, Any]]:
+    """Batching counters, or None when no local prompt has been batched yet."""
+    return _huggingface_batcher.stats() if _huggingface_batcher is not None else None
+
+
+def _response_text(response: Any) -> str:
+    """Get the text out of a chat message or plain LLM string response."""
+    if isinstance(response, str):
+        return response
+    return response.content
+
+
+async def invoke_analysis_llm(journal_text: str, model_provider: Optional[ModelProvider] = None) -> str:
+    """
+    Run the analysis prompt against the configured provider without blocking the event loop.
+
+    The call goes through the provider's admission controller and raises OverloadedError
+    when it is shed.
+
+    Args:
+        journal_text: The journal entry text to analyze
+        model_provider: Override the model provider from settings
+
+    Returns:
+        The raw text produced by the model
+    """
+    provider = resolve_provider(model_provider)
+    async with get_admission_controller(provider.value).acquire():
+        return await _invoke_analysis_llm(journal_text, provider)
+
+
+async def _invoke_analysis_llm(journal_text: str, provider: ModelProvider) -> str:
+    inputs = {"input": journal_text}
+
+    if provider == ModelProvider.HUGGINGFACE and settings.HUGGINGFACE_BATCH_MAX_SIZE > 1:
+        # Render the same text the pipeline would see and let the batcher group it with others
+        prompt_text = analysis_prompt.invoke(inputs).to_string()
+        return await get_huggingface_batcher().submit(prompt_text)
+
+    if provider == ModelProvider.HUGGINGFACE:
+        # Local inference blocks, so hand it to the bounded executor and await it
+        def _invoke():
+            model = analysis_prompt | get_llm(provider)
+            return model.invoke(inputs)
+
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(get_huggingface_executor(), _invoke)
+    else:
+        model = analysis_prompt | get_llm(provider)
+        response = await model.ainvoke(inputs)
+
+    return _response_text(response)
+
+
+async def stream_analysis_llm(journal_text: str, model_provider: Optional[ModelProvider] = None) -> AsyncIterator[str]:
+    """
+    Stream the analysis prompt output from the configured provider as text chunks.
+
+    Args:
+        journal_text: The journal entry text to analyze
+        model_provider: Override the model provider from settings
+
+    Yields:
+        Text chunks as the model produces them
+    """
+    provider = resolve_provider(model_provider)
+
+    if provider == ModelProvider.HUGGINGFACE:
+        # The local pipeline generates in one blocking call, so it arrives as a single chunk
+        yield await invoke_analysis_llm(journal_text, provider)
+        return
+
+    async with get_admission_controller(provider.value).acquire():
+        model = analysis_prompt | get_llm(provider)
+        async for chunk in model.astream({"input": journal_text}):
+            text = _response_text(chunk)
+            if text:
+                yield text
+
+
+def build_journal_analysis(result: Dict[str, Any]) -> JournalAnalysis:
+    """Create a JournalAnalysis from the JSON object parsed out of a model response."""
+    return JournalAnalysis(
+        mood=result.get("mood", "neutral"),
+        mood_score=result.get("mood_score", 67.4),
+        questions=result['questions']
+    )
+
+
+def fallback_journal_analysis() -> JournalAnalysis:
+    """Default analysis returned when the model call or parsing fails."""
+    return JournalAnalysis(
+        mood="neutral",
+        mood_score=67.4,
+        questions=[
+            "What was the most meaningful part of your day?",
+            "Did anything happen today that made you feel challenged or uncomfortable?",
+            "What's one thing you learned or realized today?",
+            "How did your actions today align with your personal values?",
+            "What would you like to focus on or improve tomorrow?"
+        ]
+    )
+
+
+async def analyze_journal_entry(journal_text: str, strict: bool = False) -> JournalAnalysis:
+    """
+    Analyze a journal entry to extract mood and generate follow-up questions.
+    
+    Args:
+        journal_text: The journal entry text to analyze
+        strict: Raise when the model call or parsing fails instead of returning
+            the generic fallback analysis
         
+    Returns:
+        JournalAnalysis object containing mood and questions
+    """
+    provider = resolve_provider()
+    model_name = llm_model_name(provider)
+    cache_key = analysis_cache_key(journal_text, provider.value, model_name)
+
+    if settings.ANALYSIS_CACHE_ENABLED:
+        cached = await analysis_cache.get(cache_key)
+        if cached is not None:
+            return cached
 
-        print("******************************")
-        print(content)
-        print("******************************")
+    try:
+        # Call the LLM
+        content = await invoke_analysis_llm(journal_text, provider)
+        logger.debug(f"Analysis model output:\n{content}")
         
         # Parse the response
         result = extract_json_from_string(content)
         
         # Create and return the JournalAnalysis object
-        return JournalAnalysis(
-            mood=result.get("mood", "neutral"),
-            mood_score=result.get("mood_score", 67.4),
-            questions=result['questions']
-        )
+        analysis = build_journal_analysis(result)
+    except OverloadedError:
+        # Shed calls are surfaced to the caller rather than answered with the fallback
+        raise
     except Exception as e:
-        print("Error analyzing journal entry:", e)
-        # Fallback for error cases
-        return JournalAnalysis(
-            mood="neutral",
-            mood_score=67.4,
-            questions=[
-                "What was the most meaningful part of your day?",
-                "Did anything happen today that made you feel challenged or uncomfortable?",
-                "What's one thing you learned or realized today?",
-                "How did your actions today align with your personal values?",
-                "What would you like to focus on or improve tomorrow?"
-            ]
-        )
+        logger.error(f"Error analyzing journal entry: {e}")
+        if strict:
+            raise
+        # Fallback for error cases, never cached so the next request retries the model
+        return fallback_journal_analysis()
+
+    if settings.ANALYSIS_CACHE_ENABLED:
+        await analysis_cache.set(cache_key, analysis, provider.value, model_name)
+    return analysis
+
+
+async def stream_journal_analysis(journal_text: str) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Analyze a journal entry, yielding mood and questions as soon as the model produces them.
+
+    Args:
+        journal_text: The journal entry text to analyze
+
+    Yields:
+        (event_type, data) tuples: "mood", "mood_score" and "question" events while
+        streaming, then a single "analysis" event carrying the final JournalAnalysis
+
+    Raises:
+        Exception: When the model call or parsing fails after events were yielded.
+            Before that, a failure falls back to the generic analysis.
+    """
+    provider = resolve_provider()
+    model_name = llm_model_name(provider)
+    cache_key = analysis_cache_key(journal_text, provider.value, model_name)
+
+    cached = await analysis_cache.get(cache_key) if settings.ANALYSIS_CACHE_ENABLED else None
+    if cached is not None:
+        yield "mood", cached.mood
+        yield "mood_score", cached.mood_score
+        for index, question in enumerate(cached.questions):
+            yield "question", {"index": index, "text": question}
+        yield "analysis", cached
+        return
+
+    extractor = StreamingJSONExtractor()
+    emitted: Dict[str, Any] = {}
+    questions: List[str] = []
+
+    def to_events(fields: List[JSONStreamEvent]) -> List[Tuple[str, Any]]:
+        events = []
+        for key, index, value in fields:
+            if key in ("mood", "mood_score") and index is None and key not in emitted:
+                emitted[key] = value
+                events.append((key, value))
+            elif key == "questions" and index is not None and isinstance(value, str):
+                events.append(("question", {"index": len(questions), "text": value}))
+                questions.append(value)
+        return events
+
+    try:
+        async for chunk in stream_analysis_llm(journal_text, provider):
+            for event in to_events(extractor.feed(chunk)):
+                yield event
+        for event in to_events(extractor.finish()):
+            yield event
+
+        if extractor.result is None:
+            raise ValueError("No valid JSON found in the model response.")
+        analysis = build_journal_analysis(extractor.result)
+        if settings.ANALYSIS_CACHE_ENABLED:
+            await analysis_cache.set(cache_key, analysis, provider.value, model_name)
+    except OverloadedError:
+        raise
+    except Exception as e:
+        logger.error(f"Error streaming journal analysis: {e}")
+        if emitted or questions:
+            # The client already holds part of this analysis; the fallback cannot continue it
+            raise
+        analysis = fallback_journal_analysis()
+
+    # Emit whatever was not streamed so clients always see the full analysis
+    if "mood" not in emitted:
+        yield "mood", analysis.mood
+    if "mood_score" not in emitted:
+        yield "mood_score", analysis.mood_score
+    for index in range(len(questions), len(analysis.questions)):
+        yield "question", {"index": index, "text": analysis.questions[index]}
 
+    yield "analysis", analysis
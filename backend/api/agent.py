@@ -1,50 +1,396 @@
-from fastapi import APIRouter, Form, HTTPException, status
-from typing import Dict, Any
+from fastapi import APIRouter, Form, Header, HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
+from typing import Dict, Any, AsyncIterator, Awaitable, Callable, List, Optional, Tuple
 from datetime import datetime
-from ai_agent.run import analyze_journal_entry
+from pydantic import BaseModel
+import asyncio
+import uuid
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from ai_agent.cache import analysis_cache, normalize_journal_text
+from ai_agent.pydantic_types import JournalAnalysis
+from ai_agent.llm import resolve_provider
+from ai_agent.run import analyze_journal_entry, huggingface_batcher_stats, stream_journal_analysis
 from models.journal import Journal
+from api.journal import update_user_streak
+from build_dataset.utils import unique_id
+from config import settings
+from utils.admission import OverloadedError, admission_stats, get_admission_controller
+from utils.helper import sse_format
+from utils.single_flight import SingleFlight
+from utils.job_queue import RetryJob, job_handler, enqueue_job
 
 router = APIRouter(prefix="/api", tags=["agent"])
 
-@router.post("/journal-analysis", status_code=status.HTTP_200_OK)
-async def analyze_journal(
-    journal_text: str = Form(...),
-) -> Dict[str, Any]:
-    """Analyze a journal entry to extract mood and generate follow-up questions"""
-    # Validate journal text
+# Concurrent submissions of the same entry (retries, double-clicks) share one analysis and one Journal
+journal_analysis_flight: SingleFlight[Tuple[Journal, Optional[int]]] = SingleFlight()
+
+# Request models
+class BatchJournalEntry(BaseModel):
+    journal_text: str
+    created_at: Optional[datetime] = None  # Original date of an imported entry
+
+class BatchAnalysisRequest(BaseModel):
+    entries: List[BatchJournalEntry]
+    background: bool = False
+
+
+def validate_journal_text(journal_text: str) -> None:
+    """Reject empty journal entries before any model call is made"""
     if not journal_text or len(journal_text.strip()) == 0:
         raise HTTPException(
             status_code=400,
             detail="Journal text cannot be empty"
         )
+
+
+async def create_journal(journal_text: str, analysis: JournalAnalysis, idempotency_key: Optional[str] = None) -> Tuple[Journal, int]:
+    """Persist a journal entry together with its analysis and count it towards the user's streak"""
+    journal = Journal(
+        entry=journal_text,
+        mood=analysis.mood,
+        mood_score=analysis.mood_score,
+        questions=analysis.questions,
+        idempotency_key=idempotency_key,
+        created_at=datetime.utcnow(),
+        updated_at=datetime.utcnow()
+    )
+    await journal.insert()
+    streak_count = await update_user_streak()
+    return journal, streak_count
+
+
+def journal_analysis_response(journal: Journal, streak_count: Optional[int] = None) -> Dict[str, Any]:
+    """Format a stored journal as the analysis endpoint response"""
+    response = {
+        "success": True,
+        "journalId": journal.journal_id,
+        "mood": journal.mood,
+        "mood_score": journal.mood_score,
+        "questions": journal.questions
+    }
+    if streak_count is not None:
+        response["streakCount"] = streak_count
+    return response
+
+
+async def analyze_and_create_journal(journal_text: str, idempotency_key: Optional[str] = None) -> Tuple[Journal, Optional[int]]:
+    """
+    Analyze an entry and persist it, replaying the stored journal for a known Idempotency-Key
+
+    Returns the journal and the updated streak count, which is None for replays.
+    """
+    if idempotency_key:
+        existing = await Journal.find_one({"idempotency_key": idempotency_key})
+        if existing:
+            return existing, None
+
+    analysis = await analyze_journal_entry(journal_text)
+
+    try:
+        return await create_journal(journal_text, analysis, idempotency_key)
+    except DuplicateKeyError:
+        # Another worker stored the same Idempotency-Key first
+        existing = await Journal.find_one({"idempotency_key": idempotency_key})
+        if existing is None:
+            raise
+        return existing, None
+
+
+@router.post("/journal-analysis", status_code=status.HTTP_200_OK)
+async def analyze_journal(
+    journal_text: str = Form(...),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+) -> Dict[str, Any]:
+    """
+    Analyze a journal entry to extract mood and generate follow-up questions
+
+    Identical entries submitted concurrently are analyzed and stored once. When an
+    `Idempotency-Key` header is sent, repeating the request returns the journal it
+    already created instead of calling the model again.
+    """
+    # Validate journal text
+    validate_journal_text(journal_text)
     
     try:
-        # Analyze the journal entry
-        analysis = analyze_journal_entry(journal_text)
+        # Requests only share a flight under the same Idempotency-Key, so every key gets stored
+        flight_key = f"{unique_id(normalize_journal_text(journal_text))}:{idempotency_key or ''}"
+        journal, streak_count = await journal_analysis_flight.do(
+            flight_key,
+            lambda: analyze_and_create_journal(journal_text, idempotency_key)
+        )
         
-        # Create a new journal entry in the database
-        journal = Journal(
-            entry=journal_text,
+        # Return the analysis result with the journal ID
+        return journal_analysis_response(journal, streak_count)
+    except OverloadedError:
+        # Answered with 503 and Retry-After by the app's exception handler
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to analyze journal entry: {str(e)}"
+        )
+
+
+@job_handler("journal_analysis")
+async def run_journal_analysis_job(payload: Dict[str, Any], progress: Callable[[int, int], Awaitable[None]]) -> Dict[str, Any]:
+    """Worker pool handler for jobs queued by POST /api/journal-analysis/async"""
+    try:
+        journal, streak_count = await analyze_and_create_journal(payload["journal_text"], payload.get("idempotency_key"))
+    except OverloadedError as e:
+        # Wait for the provider to recover instead of using up an attempt
+        raise RetryJob(str(e), e.retry_after)
+    return journal_analysis_response(journal, streak_count)
+
+
+@router.post("/journal-analysis/async", status_code=status.HTTP_202_ACCEPTED)
+async def analyze_journal_async(
+    journal_text: str = Form(...),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+) -> Dict[str, Any]:
+    """
+    Queue a journal entry for analysis and return its task ID right away
+
+    The analysis runs on the worker pool; poll GET /api/tasks/{task_id} and fetch the
+    result with `include_result=true` once the task has completed.
+    """
+    validate_journal_text(journal_text)
+
+    try:
+        task = await enqueue_job("journal_analysis", {
+            "journal_text": journal_text,
+            # A retried job replays the journal its earlier attempt stored instead of creating another
+            "idempotency_key": idempotency_key or f"job:{uuid.uuid4()}"
+        })
+        return {
+            "success": True,
+            "taskId": task.task_id,
+            "status": task.status
+        }
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to queue journal entry: {str(e)}"
+        )
+
+
+@router.post("/journal-analysis/stream")
+async def analyze_journal_stream(
+    journal_text: str = Form(...),
+) -> StreamingResponse:
+    """
+    Analyze a journal entry and stream the result as server-sent events.
+
+    Emits `mood`, `mood_score` and one `question` event per follow-up question as soon
+    as each can be parsed from the model output, then a final `done` event with the
+    persisted `journalId`. Failures after streaming has started are sent as an `error` event.
+    """
+    validate_journal_text(journal_text)
+    # Shed before the 200 and the stream start; later rejections arrive as an error event
+    get_admission_controller(resolve_provider().value).ensure_capacity()
+
+    async def event_stream() -> AsyncIterator[str]:
+        analysis = None
+        try:
+            async for event_type, data in stream_journal_analysis(journal_text):
+                if event_type == "analysis":
+                    analysis = data
+                else:
+                    yield sse_format(event_type, data)
+        except OverloadedError as e:
+            yield sse_format("error", {"detail": str(e), "retry_after": e.retry_after})
+            return
+        except Exception as e:
+            # Part of the analysis was already sent, so nothing is stored for this entry
+            yield sse_format("error", {"detail": f"Failed to analyze journal entry: {str(e)}"})
+            return
+
+        try:
+            journal, streak_count = await create_journal(journal_text, analysis)
+            yield sse_format("done", {
+                "journalId": journal.journal_id,
+                "mood": analysis.mood,
+                "mood_score": analysis.mood_score,
+                "questions": analysis.questions,
+                "streakCount": streak_count
+            })
+        except Exception as e:
+            yield sse_format("error", {"detail": f"Failed to save journal entry: {str(e)}"})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        # Stop proxies from buffering the stream, which would defeat time-to-first-question
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def run_batch_analysis(
+    entries: List[BatchJournalEntry],
+    progress: Optional[Callable[[int, int], Awaitable[None]]] = None,
+    batch_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Analyze many journal entries with bounded concurrency and store them with one insert_many.
+
+    Returns per-entry results in request order; entries that fail carry an error instead of a journalId.
+    Analyses run in strict mode, so an entry the model could not analyze is reported as an error
+    rather than stored with the generic fallback questions.
+    `progress(done, total)` is awaited after each entry is analyzed.
+
+    With a `batch_id`, entry i is stored under the idempotency key "batch:{batch_id}:{i}", so
+    running the same batch again (a retried job) replays the journals already stored instead
+    of analyzing and inserting them twice; those are counted as "replayed", not "created".
+
+    In job mode (`progress` set), a call shed by admission control fails the whole run with
+    OverloadedError once the analyzed entries are stored, so the job is retried later rather
+    than reporting those entries as failed.
+    """
+    semaphore = asyncio.Semaphore(settings.BATCH_ANALYSIS_CONCURRENCY)
+    now = datetime.utcnow()
+    done = 0
+    overloads: List[OverloadedError] = []
+
+    keys: List[Optional[str]] = [f"batch:{batch_id}:{index}" if batch_id else None for index in range(len(entries))]
+    stored: Dict[str, Journal] = {}
+    if batch_id:
+        existing = await Journal.find({"idempotency_key": {"$in": keys}}).to_list()
+        stored = {journal.idempotency_key: journal for journal in existing}
+
+    async def analyze_and_report(entry: BatchJournalEntry, key: Optional[str]) -> Dict[str, Any]:
+        nonlocal done
+        outcome = await analyze(entry, key)
+        done += 1
+        if progress is not None:
+            await progress(done, len(entries))
+        return outcome
+
+    async def analyze(entry: BatchJournalEntry, key: Optional[str]) -> Dict[str, Any]:
+        if key in stored:
+            return {"journal": stored[key], "stored": True}
+        if not entry.journal_text or len(entry.journal_text.strip()) == 0:
+            return {"error": "Journal text cannot be empty"}
+        try:
+            async with semaphore:
+                analysis = await analyze_journal_entry(entry.journal_text, strict=True)
+        except OverloadedError as e:
+            if progress is not None:
+                overloads.append(e)
+            return {"error": str(e), "retry_after": e.retry_after}
+        except Exception as e:
+            return {"error": f"Failed to analyze journal entry: {str(e)}"}
+        return {"journal": Journal(
+            entry=entry.journal_text,
             mood=analysis.mood,
             mood_score=analysis.mood_score,
             questions=analysis.questions,
-            created_at=datetime.utcnow(),
-            updated_at=datetime.utcnow()
+            idempotency_key=key,
+            created_at=entry.created_at or now,
+            updated_at=now
+        )}
+
+    outcomes = await asyncio.gather(*(analyze_and_report(entry, key) for entry, key in zip(entries, keys)))
+
+    journals = [outcome["journal"] for outcome in outcomes if "journal" in outcome]
+    new_journals = [outcome["journal"] for outcome in outcomes if "journal" in outcome and not outcome.get("stored")]
+    if new_journals:
+        try:
+            # Unordered, so one duplicate doesn't stop the rest of the batch from being inserted
+            await Journal.insert_many(new_journals, ordered=False)
+        except BulkWriteError as e:
+            if any(error["code"] != 11000 for error in e.details.get("writeErrors", [])):
+                raise
+            # A previous attempt whose lease expired stored these entries meanwhile; report its journals
+            duplicates = [new_journals[error["index"]].idempotency_key for error in e.details["writeErrors"]]
+            winners = await Journal.find({"idempotency_key": {"$in": duplicates}}).to_list()
+            stored.update({journal.idempotency_key: journal for journal in winners})
+            for outcome in outcomes:
+                journal = outcome.get("journal")
+                if journal is not None and journal.idempotency_key in stored:
+                    outcome["journal"] = stored[journal.idempotency_key]
+                    outcome["stored"] = True
+
+    if overloads:
+        # Everything analyzed so far is stored under its key; the retried job replays it
+        raise max(overloads, key=lambda e: e.retry_after)
+
+    results = []
+    for index, outcome in enumerate(outcomes):
+        if "journal" in outcome:
+            results.append({"index": index, **journal_analysis_response(outcome["journal"])})
+        else:
+            results.append({"index": index, "success": False, **outcome})
+
+    return {
+        "results": results,
+        "created": sum(1 for outcome in outcomes if "journal" in outcome and not outcome.get("stored")),
+        "replayed": sum(1 for outcome in outcomes if outcome.get("stored")),
+        "failed": len(entries) - len(journals)
+    }
+
+
+@job_handler("journal_analysis_batch")
+async def run_batch_analysis_job(payload: Dict[str, Any], progress: Callable[[int, int], Awaitable[None]]) -> Dict[str, Any]:
+    """Worker pool handler for imports queued by POST /api/journal-analysis/batch"""
+    entries = [BatchJournalEntry.model_validate(entry) for entry in payload["entries"]]
+    try:
+        return await run_batch_analysis(entries, progress, payload.get("batch_id"))
+    except OverloadedError as e:
+        # Wait for the provider to recover instead of using up an attempt
+        raise RetryJob(str(e), e.retry_after)
+
+
+@router.post("/journal-analysis/batch", status_code=status.HTTP_200_OK)
+async def analyze_journal_batch(
+    batch_request: BatchAnalysisRequest,
+    response: Response,
+) -> Dict[str, Any]:
+    """
+    Analyze and store many journal entries at once, e.g. when importing from another app.
+
+    Small imports are answered inline with per-entry results. Imports larger than
+    BATCH_ANALYSIS_BACKGROUND_THRESHOLD, or requested with `background: true`, are queued
+    for the worker pool; their status and progress are served by GET /api/tasks/{task_id}.
+    """
+    entries = batch_request.entries
+    if not entries:
+        raise HTTPException(
+            status_code=400,
+            detail="At least one journal entry is required"
         )
-        
-        # Save to database
-        await journal.insert()
-        
-        # Return the analysis result with the journal ID
+
+    if batch_request.background or len(entries) > settings.BATCH_ANALYSIS_BACKGROUND_THRESHOLD:
+        task = await enqueue_job("journal_analysis_batch", {
+            "entries": [entry.model_dump(mode="json") for entry in entries],
+            # Keys every entry, so a retried job doesn't store the entries an earlier attempt already did
+            "batch_id": str(uuid.uuid4())
+        })
+        response.status_code = status.HTTP_202_ACCEPTED
         return {
             "success": True,
-            "journalId": journal.journal_id,
-            "mood": analysis.mood,
-            "mood_score": analysis.mood_score,
-            "questions": analysis.questions
+            "taskId": task.task_id,
+            "status": task.status,
+            "total": len(entries)
         }
+
+    try:
+        result = await run_batch_analysis(entries)
+        return {"success": True, **result}
     except Exception as e:
         raise HTTPException(
             status_code=500,
-            detail=f"Failed to analyze journal entry: {str(e)}"
+            detail=f"Failed to analyze journal entries: {str(e)}"
         )
+
+
+@router.get("/metrics", status_code=status.HTTP_200_OK)
+async def get_metrics(request: Request) -> Dict[str, Any]:
+    """Counters for sizing the analysis pipeline"""
+    worker_pool = getattr(request.app.state, "worker_pool", None)
+    return {
+        "success": True,
+        "analysis_cache": analysis_cache.stats(),
+        "analysis_single_flight": journal_analysis_flight.stats(),
+        "huggingface_batcher": huggingface_batcher_stats(),
+        "job_workers": worker_pool.stats() if worker_pool is not None else None,
+        "llm_admission": admission_stats()
+    }
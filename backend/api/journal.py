@@ -1,11 +1,15 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks, status, Depends
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Query, status, Depends
 from fastapi.responses import JSONResponse
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Literal, Optional
 from datetime import datetime, timedelta
 from pydantic import BaseModel
-from models.journal import Journal, JournalEntry, JournalAnswer, UserStreak
+from models.journal import Journal, JournalEntry, JournalAnswer, JournalSummary, UserStreak
 from ai_agent.run import analyze_journal_entry
 from beanie import PydanticObjectId
+from pymongo import DESCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+import base64
+import json
 import uuid
 
 router = APIRouter(prefix="/api", tags=["journal"])
@@ -26,41 +30,91 @@ class JournalResponse(BaseModel):
     mood_score: Optional[float] = None
     questions: Optional[List[str]] = None
 
+class JournalAnswerUpdate(BaseModel):
+    answer: str
+
 class StreakResponse(BaseModel):
     success: bool
     streakCount: int
     lastEntryDate: datetime
 
+# For now, we're using a default user ID since authentication isn't implemented
+DEFAULT_USER_ID = "default_user"
+
 # Helper function to update user streak
-async def update_user_streak(user_id: str = "default_user") -> int:
-    """Update the user's streak count and return the current streak"""
-    # For now, we're using a default user ID since authentication isn't implemented
-    streak = await UserStreak.find_one({"user_id": user_id})
-    
-    if not streak:
-        # First journal entry, create a new streak
-        streak = UserStreak(user_id=user_id, streak_count=1)
-        await streak.insert()
-        return 1
-    
-    # Check if the last entry was within the last 48 hours (allowing for some flexibility)
+async def update_user_streak(user_id: str = DEFAULT_USER_ID) -> int:
+    """
+    Record a journal entry for the user's streak and return the new streak count.
+
+    The whole read-compute-write runs inside MongoDB as one find_one_and_update with an
+    aggregation-pipeline update, so concurrent submissions can't double-increment and
+    the first entry creates the document through the upsert.
+    """
     now = datetime.utcnow()
-    time_diff = now - streak.last_entry_date
-    
-    if time_diff <= timedelta(hours=48):
-        # If the last entry was within 48 hours, update the streak
-        # But only increment if it's a new day
-        if streak.last_entry_date.date() < now.date():
-            streak.streak_count += 1
-    else:
-        # Streak broken, reset to 1
-        streak.streak_count = 1
-    
-    # Update the last entry date
-    streak.last_entry_date = now
-    await streak.save()
-    
-    return streak.streak_count
+    today = datetime(now.year, now.month, now.day)
+    pipeline = [{"$set": {
+        "streak_count": {"$switch": {
+            "branches": [
+                # First journal entry
+                {"case": {"$eq": [{"$type": "$last_entry_date"}, "missing"]}, "then": 1},
+                # Already journaled today, the streak stays the same
+                {"case": {"$gte": ["$last_entry_date", today]}, "then": "$streak_count"},
+                # Last entry within 48 hours (allowing for some flexibility) on an earlier day
+                {"case": {"$gte": ["$last_entry_date", now - timedelta(hours=48)]},
+                 "then": {"$add": ["$streak_count", 1]}},
+            ],
+            # Streak broken, reset to 1
+            "default": 1
+        }},
+        "last_entry_date": now
+    }}]
+
+    collection = UserStreak.get_motor_collection()
+    try:
+        streak = await collection.find_one_and_update(
+            {"user_id": user_id}, pipeline, upsert=True, return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        # Two first entries raced on the upsert; the loser updates the winner's document
+        streak = await collection.find_one_and_update(
+            {"user_id": user_id}, pipeline, return_document=ReturnDocument.AFTER
+        )
+    return streak["streak_count"]
+
+async def set_journal_answers(journal_id: str, answers: Dict[int, str]) -> None:
+    """
+    Write answers by question index with one atomic update.
+
+    Each answer is set positionally, so concurrent saves of different answers don't
+    overwrite each other; MongoDB pads the array with nulls up to the highest index.
+    The filter requires a question at the highest index, keeping answers within range.
+    Any index outside 0 <= index < len(questions) rejects the whole update with a 400.
+    """
+    min_index = min(answers)
+    if min_index < 0:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Question index {min_index} cannot be negative"
+        )
+    max_index = max(answers)
+    updates: Dict[str, Any] = {f"answers.{index}": answer for index, answer in answers.items()}
+    updates["updated_at"] = datetime.utcnow()
+
+    result = await Journal.get_motor_collection().update_one(
+        {"journal_id": journal_id, f"questions.{max_index}": {"$exists": True}},
+        {"$set": updates}
+    )
+    if result.matched_count == 0:
+        # Only the failure path pays a second round trip to tell the two cases apart
+        if await Journal.find_one({"journal_id": journal_id}) is None:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Journal with ID {journal_id} not found"
+            )
+        raise HTTPException(
+            status_code=400,
+            detail=f"Question index {max_index} is out of range"
+        )
 
 @router.post("/journal/answers", response_model=JournalResponse)
 async def save_journal_answers(answers_request: JournalAnswersRequest):
@@ -68,27 +122,15 @@ async def save_journal_answers(answers_request: JournalAnswersRequest):
     Save answers to follow-up questions
     """
     try:
-        # Find the journal entry
-        journal = await Journal.find_one({"journal_id": answers_request.journalId})
-        if not journal:
+        answers = {answer.question_index: answer.answer for answer in answers_request.answers}
+        if answers:
+            await set_journal_answers(answers_request.journalId, answers)
+        elif await Journal.find_one({"journal_id": answers_request.journalId}) is None:
             raise HTTPException(
                 status_code=404,
                 detail=f"Journal with ID {answers_request.journalId} not found"
             )
         
-        # Update answers
-        for answer in answers_request.answers:
-            if 0 <= answer.question_index < len(journal.questions):
-                # Ensure the answer array is large enough
-                while len(journal.answers) <= answer.question_index:
-                    journal.answers.append(None)
-                
-                journal.answers[answer.question_index] = answer.answer
-        
-        # Update the journal entry
-        journal.updated_at = datetime.utcnow()
-        await journal.save()
-        
         return {
             "success": True,
             "message": "Answers saved successfully"
@@ -101,32 +143,111 @@ async def save_journal_answers(answers_request: JournalAnswersRequest):
             detail=f"Failed to save answers: {str(e)}"
         )
 
+@router.patch("/journal/{journal_id}/answers/{question_index}", response_model=JournalResponse)
+async def save_journal_answer(journal_id: str, question_index: int, answer_update: JournalAnswerUpdate):
+    """
+    Save the answer to a single follow-up question, e.g. for autosave
+    """
+    try:
+        await set_journal_answers(journal_id, {question_index: answer_update.answer})
+        
+        return {
+            "success": True,
+            "journalId": journal_id,
+            "message": "Answer saved successfully"
+        }
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to save answer: {str(e)}"
+        )
+
+def encode_journal_cursor(created_at: datetime, journal_id: str) -> str:
+    """Encode the (created_at, journal_id) position of a journal as an opaque cursor"""
+    position = json.dumps([created_at.isoformat(), journal_id])
+    return base64.urlsafe_b64encode(position.encode()).decode()
+
+def decode_journal_cursor(cursor: str) -> Dict[str, Any]:
+    """Turn a cursor back into the filter for journals strictly after that position"""
+    try:
+        created_at, journal_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        created_at = datetime.fromisoformat(created_at)
+    except Exception:
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid cursor"
+        )
+    # Newest first, with journal_id breaking ties between entries created in the same millisecond
+    return {"$or": [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "journal_id": {"$lt": journal_id}}
+    ]}
+
 @router.get("/journals", response_model=Dict[str, Any])
-async def get_journals(limit: int = 10, skip: int = 0):
+async def get_journals(
+    limit: int = Query(10, ge=1, le=100),
+    skip: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    fields: Literal["full", "summary"] = "full"
+):
     """
     Get the user's journal history
+
+    Pass the returned `next_cursor` as `cursor` to fetch the next page; unlike `skip`
+    this costs the same however deep the page is. `skip` keeps working for older clients.
+    `total` is an estimate from collection metadata and can be turned off with `include_total=false`.
+
+    `fields=summary` returns only id, date, mood, mood score, the start of the entry and
+    the number of answered questions, projected by MongoDB. `fields=full` (the default,
+    for existing clients) returns every question and answer.
     """
     try:
         # For now, we're not filtering by user since authentication isn't implemented
-        journals = await Journal.find_all().sort("-created_at").skip(skip).limit(limit).to_list()
-        
-        # Format the response
-        formatted_journals = []
-        for journal in journals:
-            formatted_journals.append({
-                "id": journal.journal_id,
-                "date": journal.created_at,
-                "entry": journal.entry,
-                "questions": journal.questions,
-                "answers": journal.answers,
-                "updated_at": journal.updated_at
-            })
+        query = Journal.find(decode_journal_cursor(cursor)) if cursor else Journal.find_all()
+        query = query.sort([("created_at", DESCENDING), ("journal_id", DESCENDING)])
+        if skip and not cursor:
+            query = query.skip(skip)
+        # Fetch one extra row to learn whether another page exists
+        query = query.limit(limit + 1)
+
+        if fields == "summary":
+            summaries = await query.project(JournalSummary).to_list()
+            has_more = len(summaries) > limit
+            summaries = summaries[:limit]
+            formatted_journals = [summary.model_dump() for summary in summaries]
+            next_cursor = encode_journal_cursor(summaries[-1].date, summaries[-1].id) if has_more else None
+        else:
+            journals = await query.to_list()
+            has_more = len(journals) > limit
+            journals = journals[:limit]
+            
+            # Format the response
+            formatted_journals = []
+            for journal in journals:
+                formatted_journals.append({
+                    "id": journal.journal_id,
+                    "date": journal.created_at,
+                    "entry": journal.entry,
+                    "questions": journal.questions,
+                    "answers": journal.answers,
+                    "updated_at": journal.updated_at
+                })
+            next_cursor = encode_journal_cursor(journals[-1].created_at, journals[-1].journal_id) if has_more else None
         
-        return {
+        response = {
             "success": True,
             "journals": formatted_journals,
-            "total": await Journal.find_all().count()
+            "next_cursor": next_cursor,
+            "has_more": has_more
         }
+        if include_total:
+            response["total"] = await Journal.get_motor_collection().estimated_document_count()
+        return response
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -171,9 +292,8 @@ async def get_user_streak():
     Get the user's current journaling streak
     """
     try:
-        # For now, we're using a default user ID since authentication isn't implemented
-        user_id = "default_user"
-        streak = await UserStreak.find_one({"user_id": user_id})
+        # The streak is maintained when entries are created; this only reads it
+        streak = await UserStreak.find_one({"user_id": DEFAULT_USER_ID})
         
         if not streak:
             return {
@@ -0,0 +1,47 @@
+from fastapi import APIRouter, HTTPException
+from typing import Dict, Any
+from utils.task_manager import TaskManager
+
+router = APIRouter(prefix="/api", tags=["tasks"])
+
+@router.get("/tasks/{task_id}", response_model=Dict[str, Any])
+async def get_task(task_id: str, include_result: bool = False):
+    """
+    Poll the status and progress of a background task
+
+    Only status, progress and error are read from MongoDB unless `include_result=true`,
+    so frequent polling stays cheap even when the result is large.
+    """
+    try:
+        if include_result:
+            task = await TaskManager.get_task(task_id)
+        else:
+            task = await TaskManager.get_task_progress(task_id)
+        if not task:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Task with ID {task_id} not found"
+            )
+        
+        response = {
+            "id": task.task_id,
+            "status": task.status,
+            "progress": task.progress,
+            "error": task.error,
+            "updated_at": task.updated_at
+        }
+        if include_result:
+            response["result"] = task.result
+            response["created_at"] = task.created_at
+        
+        return {
+            "success": True,
+            "task": response
+        }
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to fetch task: {str(e)}"
+        )
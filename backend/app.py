@@ -4,7 +4,13 @@ from fastapi.middleware.cors import CORSMiddleware
 from models.run_history import AgentRun, AgentRunInput, AgentRunOutput
 from models.task import Task
 from models.journal import Journal, UserStreak
+from models.analysis_cache import CachedAnalysis
 from config import settings
+from ai_agent.llm import init_llm_registry, clear_llm_registry
+from ai_agent.run import close_huggingface_batcher, shutdown_huggingface_executor
+from utils.indexes import find_uncovered_queries
+from utils.job_queue import JobWorkerPool
+from utils.admission import OverloadedError
 from motor.motor_asyncio import AsyncIOMotorClient
 from beanie import init_beanie
 from contextlib import asynccontextmanager
@@ -12,11 +18,39 @@ from contextlib import asynccontextmanager
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     client = AsyncIOMotorClient(settings.MONGODB_URL)
-    await init_beanie(database=client[settings.MONGODB_DB], document_models=[AgentRun, Task, Journal, UserStreak])
+    await init_beanie(database=client[settings.MONGODB_DB], document_models=[AgentRun, Task, Journal, UserStreak, CachedAnalysis])
+    # init_beanie creates the declared indexes; warn about any hot query they don't serve
+    await find_uncovered_queries()
+    # Build the model client once so requests only pay for inference
+    init_llm_registry()
+    worker_pool = None
+    if settings.JOB_WORKERS_ENABLED:
+        worker_pool = JobWorkerPool(
+            concurrency=settings.JOB_WORKER_CONCURRENCY,
+            lease_seconds=settings.JOB_LEASE_SECONDS,
+            poll_interval=settings.JOB_POLL_INTERVAL_SECONDS,
+            max_attempts=settings.JOB_MAX_ATTEMPTS
+        )
+        await worker_pool.start()
+    app.state.worker_pool = worker_pool
     yield
+    if worker_pool is not None:
+        await worker_pool.stop()
+    await close_huggingface_batcher()
+    shutdown_huggingface_executor()
+    clear_llm_registry()
 
 app = FastAPI(title="Mental Health Journal API", version="1.0.0", lifespan=lifespan)
 
+@app.exception_handler(OverloadedError)
+async def overloaded_handler(request, exc: OverloadedError):
+    """Shed load with a 503 that tells clients when to come back"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": exc.retry_after_header}
+    )
+
 # Configure CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -28,9 +62,11 @@ app.add_middleware(
 
 from api.agent import router as agent_router
 from api.journal import router as journal_router
+from api.tasks import router as tasks_router
 
 app.include_router(agent_router)
 app.include_router(journal_router)
+app.include_router(tasks_router)
 
 # For local development only
 if __name__ == "__main__":
@@ -0,0 +1,131 @@
+"""
+Benchmark batched vs unbatched local generation on CPU.
+
+Builds a tiny randomly initialised causal LM and a word-level tokenizer in memory
+(no downloads), then pushes the same set of concurrent prompts through
+MicroBatcher with a batch size of 1 and with larger batch sizes, reporting
+generated tokens per second for each.
+
+Usage (from backend/):
+    python -m benchmarks.bench_microbatch --requests 32 --new-tokens 32 --batch-sizes 1 4 8 16
+"""
+import argparse
+import asyncio
+import functools
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from ai_agent.batching import MicroBatcher, generate_batch
+
+TRAIN_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "train.jsonl")
+
+
+def load_prompts(count: int) -> List[str]:
+    """Use journal entries from train.jsonl as prompts, falling back to synthetic text."""
+    prompts = []
+    if os.path.exists(TRAIN_PATH):
+        with open(TRAIN_PATH) as f:
+            for line in f:
+                prompts.append(json.loads(line)["input"])
+                if len(prompts) == count:
+                    break
+    while len(prompts) < count:
+        prompts.append(" ".join(["today I felt something new"] * (1 + len(prompts) % 5)))
+    return prompts
+
+
+def build_tiny_model(prompts: List[str], seed: int = 0):
+    """Create a random 2-layer GPT-2 and a matching word-level tokenizer."""
+    import torch
+    from tokenizers import Tokenizer
+    from tokenizers.models import WordLevel
+    from tokenizers.pre_tokenizers import Whitespace
+    from transformers import GPT2Config, GPT2LMHeadModel, PreTrainedTokenizerFast
+
+    torch.manual_seed(seed)
+    specials = ["[PAD]", "[UNK]", "[EOS]"]
+    words = sorted({word for prompt in prompts for word in prompt.split()})
+    vocab = {token: index for index, token in enumerate(specials + words)}
+
+    backend = Tokenizer(WordLevel(vocab, unk_token="[UNK]"))
+    backend.pre_tokenizer = Whitespace()
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=backend,
+        pad_token="[PAD]",
+        unk_token="[UNK]",
+        eos_token="[EOS]"
+    )
+
+    config = GPT2Config(
+        vocab_size=len(vocab),
+        n_positions=1024,
+        n_embd=128,
+        n_layer=2,
+        n_head=4,
+        pad_token_id=vocab["[PAD]"],
+        eos_token_id=vocab["[EOS]"],
+        bos_token_id=vocab["[EOS]"]
+    )
+    model = GPT2LMHeadModel(config).eval()
+    return tokenizer, model
+
+
+async def run_once(tokenizer, model, prompts: List[str], batch_size: int, new_tokens: int, max_wait_ms: float) -> float:
+    """Submit every prompt concurrently and return generated tokens per second."""
+    executor = ThreadPoolExecutor(max_workers=1)
+    batcher = MicroBatcher(
+        functools.partial(
+            generate_batch,
+            tokenizer,
+            model,
+            max_new_tokens=new_tokens,
+            # Force a fixed output length so both modes generate the same number of tokens
+            min_new_tokens=new_tokens,
+            do_sample=False
+        ),
+        max_batch_size=batch_size,
+        max_wait_ms=max_wait_ms,
+        executor=executor
+    )
+    try:
+        start = time.perf_counter()
+        await asyncio.gather(*(batcher.submit(prompt) for prompt in prompts))
+        elapsed = time.perf_counter() - start
+    finally:
+        await batcher.close()
+        executor.shutdown(wait=True)
+    return len(prompts) * new_tokens / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=32, help="Concurrent prompts per run")
+    parser.add_argument("--new-tokens", type=int, default=32, help="Tokens generated per prompt")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--max-wait-ms", type=float, default=10.0)
+    parser.add_argument("--threads", type=int, default=None, help="torch CPU threads (default: torch's choice)")
+    args = parser.parse_args()
+
+    import torch
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    prompts = load_prompts(args.requests)
+    tokenizer, model = build_tiny_model(prompts)
+
+    # Warm up kernels and allocator so the first measured run isn't penalised
+    asyncio.run(run_once(tokenizer, model, prompts[:2], 2, 4, args.max_wait_ms))
+
+    baseline = None
+    print(f"{'batch size':>10}  {'tokens/sec':>12}  {'speedup':>8}")
+    for batch_size in args.batch_sizes:
+        tokens_per_sec = asyncio.run(run_once(tokenizer, model, prompts, batch_size, args.new_tokens, args.max_wait_ms))
+        baseline = baseline or tokens_per_sec
+        print(f"{batch_size:>10}  {tokens_per_sec:>12.1f}  {tokens_per_sec / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark API import time and memory for each model provider.
+
+Imports app.py in a fresh interpreter once per provider (MODEL_PROVIDER set in
+the environment) and reports the import time, the peak RSS of the process and
+which provider backends ended up imported. With --check, exits non-zero when a
+provider pulls in another provider's backend, so eager imports creeping back
+into the startup path show up as a failure.
+
+Usage (from backend/):
+    python -m benchmarks.bench_startup --repeat 3 --check
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Any, Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROVIDERS = ["openai", "ollama", "huggingface"]
+
+# Top-level modules that belong to each provider's backend
+PROVIDER_MODULES = {
+    "openai": ["langchain_openai", "openai"],
+    "ollama": ["langchain_ollama", "ollama"],
+    "huggingface": ["langchain_huggingface", "transformers", "torch"],
+}
+
+PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import app
+elapsed = time.perf_counter() - start
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+# ru_maxrss is in kilobytes on Linux and in bytes on macOS
+rss_mb = rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+modules = sorted({name.split(".")[0] for name in sys.modules})
+print(json.dumps({"import_seconds": elapsed, "max_rss_mb": rss_mb, "modules": modules}))
+"""
+
+
+def measure(provider: str) -> Dict[str, Any]:
+    """Import app.py in a new interpreter with `provider` configured."""
+    env = dict(os.environ, MODEL_PROVIDER=provider)
+    # Settings require a key even though nothing is sent at import time
+    env.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing app with MODEL_PROVIDER={provider} failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def foreign_backends(provider: str, modules: List[str]) -> List[str]:
+    """Backends of other providers that were imported."""
+    loaded = set(modules)
+    return sorted(
+        module
+        for other, names in PROVIDER_MODULES.items() if other != provider
+        for module in names if module in loaded and module not in PROVIDER_MODULES[provider]
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--providers", nargs="+", default=PROVIDERS, choices=PROVIDERS)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per provider; the median is reported")
+    parser.add_argument("--check", action="store_true", help="Fail if a provider imports another provider's backend")
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'provider':>12}  {'import s':>9}  {'max RSS MB':>10}  other backends imported")
+    for provider in args.providers:
+        runs = [measure(provider) for _ in range(args.repeat)]
+        seconds = statistics.median(run["import_seconds"] for run in runs)
+        rss = statistics.median(run["max_rss_mb"] for run in runs)
+        foreign = foreign_backends(provider, runs[-1]["modules"])
+        if foreign:
+            failures.append(provider)
+        print(f"{provider:>12}  {seconds:>9.2f}  {rss:>10.1f}  {', '.join(foreign) or '-'}")
+
+    if args.check and failures:
+        print(f"❌ Eager provider imports for: {', '.join(failures)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
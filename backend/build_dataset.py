@@ -4,13 +4,15 @@ import os
 import random
 import dotenv
 import logging
+import sys
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Tuple
-from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Set, Tuple
+import asyncio
 
 # Import modules from the build_dataset package
-from build_dataset.utils import unique_id, load_life_events
-from build_dataset.journal_generator import create_llm, generate_journal_entry_from_event, generate_followup_questions, batch_generate_entries_and_questions
+from build_dataset.utils import unique_id, load_life_events, load_completed_ids, JsonlAppender
+from build_dataset.journal_generator import DEFAULT_CONCURRENCY, DEFAULT_GENERATION_MODE, FUSED_MODE, stream_entries_and_questions
+from build_dataset.generation_cache import CACHE_FILENAME, GenerationCache
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -18,32 +20,100 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 # Load environment variables
 dotenv.load_dotenv()
 
-# Check for API key
-if not os.getenv("OPENAI_API_KEY"):
+# Check for API key; --replay builds from the generation cache and never calls the model
+if "--replay" not in sys.argv[1:] and not os.getenv("OPENAI_API_KEY"):
     raise ValueError("OPENAI_API_KEY environment variable is not set. Please set it in your .env file.")
 
-def save_batch_to_jsonl(batch_data: List[Dict[str, Any]], out_path: str) -> None:
-    """Save a batch of data to a JSONL file.
+def format_questions(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn the generated question list into the numbered text used as the training output."""
+    record["output"] = '\n'.join([f"{questionId+1}. {q}" for questionId, q in enumerate(record["output"]["questions"])])
+    return record
+
+def fallback_path_for(out_path: str) -> str:
+    """Sidecar file listing the events that fell back, e.g. train.jsonl -> train.fallback.jsonl."""
+    root, ext = os.path.splitext(out_path)
+    return f"{root}.fallback{ext or '.jsonl'}"
+
+def prune_fallback_sidecar(out_path: str, settled_ids: Set[str]) -> int:
+    """Rewrite the fallback sidecar without the events that are done or about to be retried.
+
+    Without this, every resume would append another line for each event that keeps
+    failing, and events that have since succeeded would stay listed.
+
+    Args:
+        out_path: Path to the dataset JSONL file.
+        settled_ids: Event ids that already have a row or are retried by this run.
+
+    Returns:
+        Number of entries kept.
+    """
+    path = fallback_path_for(out_path)
+    if not os.path.exists(path):
+        return 0
+    kept = []
+    with open(path, "r") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # Torn last line of an interrupted run
+            if row.get("event_id") not in settled_ids:
+                kept.append(line if line.endswith("\n") else line + "\n")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.writelines(kept)
+    os.replace(tmp_path, path)
+    return len(kept)
+
+async def generate_to_jsonl(events: List[str], out_path: str, concurrency: int, cache: Optional[GenerationCache] = None, mode: str = DEFAULT_GENERATION_MODE) -> List[Dict[str, Any]]:
+    """Generate records concurrently and append each one to the JSONL file as it completes.
+    
+    Events that still failed after retries are not written to the dataset; they
+    are listed in the fallback sidecar instead, and a resumed build tries them again.
     
     Args:
-        batch_data: List of dictionaries containing journal entries and follow-up questions.
+        events: List of life event descriptions.
         out_path: Path to the output JSONL file.
+        concurrency: Number of events processed at the same time to start with.
+        cache: Generation cache shared by every call.
+        mode: "two_call" or "fused" generation; the rows have the same format either way.
+        
+    Returns:
+        List of the records written, in completion order.
     """
-    with open(out_path, "a") as f:
-        for row in batch_data:
-            f.write(json.dumps(row, ensure_ascii=False) + "\n")
-    logging.info(f"✅ Saved {len(batch_data)} records to {out_path}")
+    all_data = []
+    failed = 0
+    with JsonlAppender(out_path) as out_file, JsonlAppender(fallback_path_for(out_path)) as fallback_file:
+        async for event, entry in stream_entries_and_questions(events, concurrency, cache=cache, mode=mode):
+            # The event id lets a resumed build skip events that are already done
+            event_id = unique_id(event)
+            if entry.get("fallback"):
+                failed += 1
+                fallback_file.write({"event_id": event_id, "event": event, "error": entry.get("error")})
+                logging.warning(f"⚠️ Generation failed for: {event[:30]}...")
+                continue
+            entry["event_id"] = event_id
+            out_file.write(format_questions(entry))
+            all_data.append(entry)
+            logging.info(f"✅ [{len(all_data) + failed}/{len(events)}] Saved entry for: {event[:30]}...")
+    if failed:
+        logging.warning(f"{failed} events fell back and were listed in {fallback_path_for(out_path)}; rerun with --resume to retry them")
+    return all_data
 
-def build_dataset_from_life_events(life_events: List[str], num_samples: int, out_path: str) -> List[Dict[str, Any]]:
+def build_dataset_from_life_events(life_events: List[str], num_samples: int, out_path: str, concurrency: int = DEFAULT_CONCURRENCY, resume: bool = False, cache: Optional[GenerationCache] = None, mode: str = DEFAULT_GENERATION_MODE) -> List[Dict[str, Any]]:
     """Build a dataset of journal entries and follow-up questions from life events.
     
     Args:
         life_events: List of life event descriptions.
         num_samples: Number of samples to generate. Will be capped by the number of life events.
         out_path: Path to the output JSONL file.
+        concurrency: Maximum number of events processed at the same time.
+        resume: Keep the rows already in out_path and only generate the missing events.
+        cache: Generation cache; prompts already answered are not sent again.
+        mode: "two_call" to generate the entry and then its questions, or "fused" for one call per event.
         
     Returns:
-        List of dictionaries containing journal entries and follow-up questions.
+        List of dictionaries containing the journal entries and follow-up questions generated by this run.
     """
     # Use only the requested number of samples, or all life events if fewer
     events_to_use = life_events[:num_samples] if num_samples < len(life_events) else life_events
@@ -51,36 +121,25 @@ def build_dataset_from_life_events(life_events: List[str], num_samples: int, out
     # Shuffle the events to get random ones each time
     random.shuffle(events_to_use)
     
-    # Initialize output file
-    with open(out_path, "w") as f:
-        pass  # Create empty file or clear existing one
+    if resume:
+        # Skip events whose rows were already written by an earlier run
+        completed = load_completed_ids(out_path)
+        events_to_use = [event for event in events_to_use if unique_id(event) not in completed]
+        # Failures listed by earlier runs are either done now or retried below, which lists them again if they fail
+        prune_fallback_sidecar(out_path, completed | {unique_id(event) for event in events_to_use})
+        logging.info(f"Resuming: {len(completed)} records already in {out_path}")
+    else:
+        # Initialize output files
+        for path in (out_path, fallback_path_for(out_path)):
+            with open(path, "w") as f:
+                pass  # Create empty file or clear existing one
     
-    logging.info(f"Building dataset with {len(events_to_use)} life events...")
+    logging.info(f"Building dataset with {len(events_to_use)} life events, {concurrency} at a time ({mode} mode)...")
     
-    # Process in batches of 50
-    BATCH_SIZE = 50
     all_data = []
     
     try:
-        for batch_start in range(0, len(events_to_use), BATCH_SIZE):
-            batch_end = min(batch_start + BATCH_SIZE, len(events_to_use))
-            batch_events = events_to_use[batch_start:batch_end]
-            
-            logging.info(f"Processing batch {batch_start//BATCH_SIZE + 1}: events {batch_start+1} to {batch_end}")
-            
-            # Process batch of events
-            batch_data = batch_generate_entries_and_questions(batch_events)
-            
-            # Format questions
-            for item in batch_data:
-                item["output"] = '\n'.join([f"{questionId+1}. {q}" for questionId, q in enumerate(item["output"]["questions"])])
-            
-            # Save batch to file immediately
-            save_batch_to_jsonl(batch_data, out_path)
-            
-            # Add to full dataset
-            all_data.extend(batch_data)
-            
+        all_data = asyncio.run(generate_to_jsonl(events_to_use, out_path, concurrency, cache, mode))
     except Exception as e:
         logging.error(f"Error building dataset: {e}")
     
@@ -105,9 +164,32 @@ if __name__ == "__main__":
         # Output path
         out_path = "train.jsonl"
         
+        # Pass --resume to continue an interrupted build instead of starting over
+        resume = "--resume" in sys.argv[1:]
+        
+        # Responses are cached on disk; --replay builds from the cache only, --no-cache bypasses it.
+        # TMP_DIR matches the API settings, which are not loaded here because they require an API key.
+        cache = None
+        if "--no-cache" not in sys.argv[1:]:
+            tmp_dir = os.getenv("TMP_DIR", os.path.join(os.getcwd(), "tmp"))
+            cache = GenerationCache(os.path.join(tmp_dir, CACHE_FILENAME), replay="--replay" in sys.argv[1:])
+        
+        # --fused gets each entry and its questions in one call instead of two
+        mode = FUSED_MODE if "--fused" in sys.argv[1:] else DEFAULT_GENERATION_MODE
+        
         # Build the dataset - now saves incrementally to the JSONL file
         logging.info(f"Starting dataset generation with up to {N} samples")
-        data = build_dataset_from_life_events(life_events, N, out_path)
+        try:
+            data = build_dataset_from_life_events(life_events, N, out_path, resume=resume, cache=cache, mode=mode)
+        finally:
+            if cache is not None:
+                cache.close()
+        
+        # --dedup flags near-duplicate and fallback rows and writes a filtered copy next to the dataset
+        if "--dedup" in sys.argv[1:]:
+            from build_dataset.dedup import dedup_jsonl
+            stem = os.path.splitext(out_path)[0]
+            dedup_jsonl(out_path, out_path=f"{stem}.dedup.jsonl", report_path=f"{stem}.dedup_report.json")
         
         logging.info(f"✅ Successfully generated {len(data)} unique records → {out_path}")
         print(f"✅ Generated {len(data)} unique records → {out_path}")
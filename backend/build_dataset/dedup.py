@@ -0,0 +1,350 @@
+"""Near-duplicate detection for generated datasets.
+
+Rows are compared with MinHash signatures over word shingles, and candidate
+pairs are found with locality-sensitive hashing, so the cost grows linearly
+with the number of rows instead of comparing every pair. Candidates whose
+estimated Jaccard similarity reaches the threshold are merged into clusters with
+union-find; the first row of each cluster is kept and the rest are flagged.
+Rows containing the fallback text written when generation failed are flagged
+separately, since they are exact copies of each other by construction.
+
+Usage:
+    python -m build_dataset.dedup train.jsonl --out train.dedup.jsonl
+"""
+import argparse
+import json
+import logging
+import re
+import time
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from build_dataset.utils import FALLBACK_ENTRY_SUFFIX, FALLBACK_QUESTIONS
+
+DEFAULT_FIELDS = ("input", "output")
+DEFAULT_THRESHOLD = 0.7
+DEFAULT_NUM_PERM = 128
+DEFAULT_SHINGLE_SIZE = 3
+
+_WORD = re.compile(r"\w+")
+_QUESTION_NUMBER = re.compile(r"^\s*\d+\.\s*", re.MULTILINE)
+# Odd 64-bit constant used to fold the word ids of a shingle into one key
+_KEY_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+# Shingles hashed per block; small enough for the hash matrix to stay in cache
+_BLOCK_SHINGLES = 1 << 12
+
+_FALLBACK_QUESTION_TEXT = " ".join(FALLBACK_QUESTIONS)
+
+
+def field_text(value: Any) -> str:
+    """Flatten a row field to plain text; question lists and numbered outputs compare the same."""
+    if isinstance(value, dict):
+        value = value.get("questions", value)
+    if isinstance(value, list):
+        value = " ".join(str(item) for item in value)
+    return _QUESTION_NUMBER.sub("", str(value or ""))
+
+
+def is_fallback_row(row: Dict[str, Any]) -> bool:
+    """Whether a row holds the text written when generation failed."""
+    if row.get("fallback"):
+        return True
+    if str(row.get("input", "")).endswith(FALLBACK_ENTRY_SUFFIX):
+        return True
+    return " ".join(field_text(row.get("output")).split()) == _FALLBACK_QUESTION_TEXT
+
+
+class _UnionFind:
+    """Disjoint sets over row indices, keeping the smallest index as the root."""
+
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, item: int) -> int:
+        root = item
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[item] != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, a: int, b: int) -> None:
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+
+def choose_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """Pick (bands, rows per band) whose LSH threshold (1/bands)^(1/rows) is just below `threshold`.
+
+    Erring low keeps recall high; candidates are verified against the real threshold afterwards.
+    """
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        if (1 / bands) ** (1 / rows) <= threshold:
+            best = (bands, rows)
+    return best
+
+
+def shingle_keys(texts: Sequence[str], shingle_size: int = DEFAULT_SHINGLE_SIZE) -> Tuple[np.ndarray, np.ndarray]:
+    """Encode every text as word shingles.
+
+    Args:
+        texts: Texts to encode.
+        shingle_size: Words per shingle; texts with fewer words form one shorter shingle.
+
+    Returns:
+        (keys, starts): the shingle keys of all texts concatenated, and the offset
+        where each text's keys begin. Every text has at least one key.
+    """
+    ids: List[int] = []
+    lengths = np.empty(len(texts), dtype=np.int64)
+    for i, text in enumerate(texts):
+        # crc32 keeps word ids stable across runs, unlike the salted built-in hash
+        words = _WORD.findall(text.lower()) or [""]
+        ids.extend(map(zlib.crc32, map(str.encode, words)))
+        lengths[i] = len(words)
+
+    word_ids = np.asarray(ids, dtype=np.uint64) + np.uint64(1)
+    word_starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    word_ends = word_starts + lengths
+
+    # One shingle per word position that leaves room for a full shingle inside its own text
+    counts = np.maximum(lengths - shingle_size + 1, 1)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    positions = np.repeat(word_starts - starts, counts) + np.arange(counts.sum())
+    ends = np.repeat(word_ends, counts)
+
+    # Fold the word ids of each shingle into one 64-bit key
+    keys = np.zeros(len(positions), dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for offset in range(shingle_size):
+            index = positions + offset
+            inside = index < ends
+            word = np.where(inside, word_ids[np.minimum(index, len(word_ids) - 1)], np.uint64(0))
+            keys = keys * _KEY_MULTIPLIER + word
+    return keys, starts
+
+
+def minhash_signatures(keys: np.ndarray, starts: np.ndarray, num_perm: int = DEFAULT_NUM_PERM,
+                       seed: int = 1) -> np.ndarray:
+    """MinHash signature of every text.
+
+    Each permutation is a multiply-shift hash (a * key + b) >> 32 over 64-bit
+    words, which is cheap to vectorise and universal for odd `a`.
+
+    Args:
+        keys: Shingle keys from shingle_keys.
+        starts: Offset of each text's first key.
+        num_perm: Number of hash functions.
+        seed: Seed for the hash parameters, so signatures are reproducible.
+
+    Returns:
+        uint32 array of shape (texts, num_perm).
+    """
+    rng = np.random.default_rng(seed)
+    a = (rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64) << np.uint64(1)) | np.uint64(1)
+    b = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64)
+    signatures = np.empty((len(starts), num_perm), dtype=np.uint32)
+    bounds = np.append(starts, len(keys))
+    buffer = np.empty((num_perm, _BLOCK_SHINGLES), dtype=np.uint64)
+
+    # Hash whole texts in blocks of about _BLOCK_SHINGLES keys, reusing one buffer
+    first = 0
+    with np.errstate(over="ignore"):
+        while first < len(starts):
+            last = int(np.searchsorted(bounds, bounds[first] + _BLOCK_SHINGLES, side="right")) - 1
+            last = max(last, first + 1)
+            block = keys[bounds[first]:bounds[last]]
+            hashed = buffer[:, :len(block)] if len(block) <= _BLOCK_SHINGLES else np.empty((num_perm, len(block)), np.uint64)
+            np.multiply(a[:, None], block[None, :], out=hashed)
+            hashed += b[:, None]
+            hashed >>= np.uint64(32)
+            signatures[first:last] = np.minimum.reduceat(hashed, bounds[first:last] - bounds[first], axis=1).T
+            first = last
+    return signatures
+
+
+def find_near_duplicates(
+    texts: Sequence[str],
+    threshold: float = DEFAULT_THRESHOLD,
+    num_perm: int = DEFAULT_NUM_PERM,
+    shingle_size: int = DEFAULT_SHINGLE_SIZE,
+    seed: int = 1
+) -> List[List[int]]:
+    """Group texts whose estimated Jaccard similarity reaches `threshold`.
+
+    Args:
+        texts: Texts to compare.
+        threshold: Minimum Jaccard similarity of word shingles.
+        num_perm: MinHash permutations; more gives a tighter similarity estimate.
+        shingle_size: Words per shingle.
+        seed: Seed for the MinHash parameters.
+
+    Returns:
+        Clusters of two or more indices, each sorted, ordered by their first index.
+    """
+    if len(texts) < 2:
+        return []
+    keys, starts = shingle_keys(texts, shingle_size)
+    signatures = minhash_signatures(keys, starts, num_perm, seed)
+    bands, rows = choose_bands(num_perm, threshold)
+
+    pairs = []
+    with np.errstate(over="ignore"):
+        for band in range(bands):
+            # Hash the band's rows of the signature into one bucket key per text
+            bucket = np.zeros(len(texts), dtype=np.uint64)
+            for column in signatures[:, band * rows:(band + 1) * rows].T:
+                bucket = bucket * _KEY_MULTIPLIER + column.astype(np.uint64)
+            order = np.argsort(bucket, kind="stable")
+            sorted_buckets = bucket[order]
+            # Compare every member of a bucket with the bucket's first member
+            is_start = np.concatenate(([True], sorted_buckets[1:] != sorted_buckets[:-1]))
+            if is_start.all():
+                continue
+            first_member = order[np.maximum.accumulate(np.where(is_start, np.arange(len(order)), 0))]
+            candidates, anchors = order[~is_start], first_member[~is_start]
+            similarity = (signatures[candidates] == signatures[anchors]).mean(axis=1)
+            matched = similarity >= threshold
+            pairs.append(candidates[matched].astype(np.int64) * len(texts) + anchors[matched])
+
+    # The same pair usually collides in several bands; union each one once
+    union_find = _UnionFind(len(texts))
+    if pairs:
+        for pair in np.unique(np.concatenate(pairs)).tolist():
+            union_find.union(*divmod(pair, len(texts)))
+
+    clusters: Dict[int, List[int]] = {}
+    for index in range(len(texts)):
+        root = union_find.find(index)
+        if root != index:
+            clusters.setdefault(root, [root]).append(index)
+    return [sorted(cluster) for _, cluster in sorted(clusters.items())]
+
+
+def dedup_rows(
+    rows: List[Dict[str, Any]],
+    fields: Iterable[str] = DEFAULT_FIELDS,
+    threshold: float = DEFAULT_THRESHOLD,
+    num_perm: int = DEFAULT_NUM_PERM,
+    shingle_size: int = DEFAULT_SHINGLE_SIZE
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """Flag fallback rows and near-duplicates, and return the rows to keep with a report.
+
+    A row is dropped if it is a fallback row, or if it is not the first row of
+    its cluster for any of `fields`.
+
+    Args:
+        rows: Dataset rows.
+        fields: Fields compared independently, e.g. the entry and the questions.
+        threshold: Minimum Jaccard similarity of word shingles.
+        num_perm: MinHash permutations.
+        shingle_size: Words per shingle.
+
+    Returns:
+        (kept rows, report)
+    """
+    start = time.perf_counter()
+    fallback = [i for i, row in enumerate(rows) if is_fallback_row(row)]
+    dropped = set(fallback)
+    # Fallback rows would only form one big cluster, so they are left out of the comparison
+    candidates = [i for i in range(len(rows)) if i not in dropped]
+
+    report: Dict[str, Any] = {
+        "total_rows": len(rows),
+        "fallback_rows": fallback,
+        "threshold": threshold,
+        "num_perm": num_perm,
+        "shingle_size": shingle_size,
+        "fields": {},
+    }
+    for field in fields:
+        texts = [field_text(rows[i].get(field)) for i in candidates]
+        clusters = [[candidates[i] for i in cluster]
+                    for cluster in find_near_duplicates(texts, threshold, num_perm, shingle_size)]
+        for cluster in clusters:
+            dropped.update(cluster[1:])
+        report["fields"][field] = {
+            "clusters": len(clusters),
+            "duplicate_rows": sum(len(cluster) - 1 for cluster in clusters),
+            "examples": [
+                {"rows": cluster, "texts": [field_text(rows[i].get(field))[:200] for i in cluster[:3]]}
+                for cluster in clusters
+            ],
+        }
+
+    kept = [row for i, row in enumerate(rows) if i not in dropped]
+    report["dropped_rows"] = sorted(dropped)
+    report["kept_rows"] = len(kept)
+    report["elapsed_seconds"] = round(time.perf_counter() - start, 3)
+    return kept, report
+
+
+def dedup_jsonl(
+    in_path: str,
+    out_path: Optional[str] = None,
+    report_path: Optional[str] = None,
+    **options: Any
+) -> Dict[str, Any]:
+    """Run dedup_rows over a JSONL file.
+
+    Args:
+        in_path: Dataset to check.
+        out_path: Where to write the rows that are kept; nothing is written if omitted.
+        report_path: Where to write the JSON report.
+        **options: Passed to dedup_rows.
+
+    Returns:
+        The report.
+    """
+    with open(in_path, "r") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+
+    kept, report = dedup_rows(rows, **options)
+    report["source"] = in_path
+
+    if out_path:
+        with open(out_path, "w") as f:
+            for row in kept:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        report["output"] = out_path
+    if report_path:
+        with open(report_path, "w") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    logging.info(
+        f"Dedup of {in_path}: {len(report['fallback_rows'])} fallback rows, "
+        + ", ".join(f"{field} {info['duplicate_rows']} near-duplicates in {info['clusters']} clusters"
+                    for field, info in report["fields"].items())
+        + f"; kept {report['kept_rows']}/{report['total_rows']} in {report['elapsed_seconds']}s"
+    )
+    return report
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="JSONL dataset to check")
+    parser.add_argument("--out", default=None, help="Write the rows that are kept to this file")
+    parser.add_argument("--report", default=None, help="Report path (default: <path stem>.dedup_report.json)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--num-perm", type=int, default=DEFAULT_NUM_PERM)
+    parser.add_argument("--shingle-size", type=int, default=DEFAULT_SHINGLE_SIZE)
+    parser.add_argument("--fields", nargs="+", default=list(DEFAULT_FIELDS))
+    args = parser.parse_args()
+
+    dedup_jsonl(
+        args.path,
+        out_path=args.out,
+        report_path=args.report or args.path.rsplit(".", 1)[0] + ".dedup_report.json",
+        fields=args.fields,
+        threshold=args.threshold,
+        num_perm=args.num_perm,
+        shingle_size=args.shingle_size
+    )
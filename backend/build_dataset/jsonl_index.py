@@ -0,0 +1,192 @@
+"""Random access into JSONL datasets through a line-offset index.
+
+The first time a file is opened, the byte offset of every record is found
+with a vectorised newline scan and saved next to it as `<file>.idx`, together
+with the file size and modification time it was built for. Later opens
+memory-map that index and check it against the file, so looking up record i
+costs one seek whatever the size of the file. Records are only parsed when
+they are read.
+
+Usage:
+    with JsonlReader("train.jsonl") as reader:
+        row = reader[123]
+        first_hundred = reader[:100]  # lazy view, nothing parsed yet
+        train, eval_ = reader.split(eval_fraction=0.1, seed=0)
+"""
+import json
+import logging
+import mmap
+import os
+import random
+import struct
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+INDEX_SUFFIX = ".idx"
+_MAGIC = b"JSONLIDX"
+_VERSION = 1
+# magic, version, file size, file mtime in ns, record count
+_HEADER = struct.Struct("<8sIQqQ")
+# Bytes scanned for newlines at a time, to bound memory on large files
+_SCAN_BLOCK = 64 << 20
+
+
+def index_path_for(path: str) -> str:
+    """Sidecar index path for a JSONL file."""
+    return path + INDEX_SUFFIX
+
+
+def scan_offsets(data: Union[mmap.mmap, bytes]) -> np.ndarray:
+    """Find where every non-empty line starts and ends.
+
+    Returns:
+        int64 array of shape (records, 2) with the start and end (exclusive, without the newline) of each line.
+    """
+    size = len(data)
+    ends = []
+    for block_start in range(0, size, _SCAN_BLOCK):
+        block = np.frombuffer(data, dtype=np.uint8, count=min(_SCAN_BLOCK, size - block_start), offset=block_start)
+        ends.append(np.flatnonzero(block == ord("\n")) + block_start)
+    line_ends = np.concatenate(ends) if ends else np.empty(0, dtype=np.int64)
+    if size and (not len(line_ends) or line_ends[-1] != size - 1):
+        # The last line has no trailing newline
+        line_ends = np.append(line_ends, size)
+    line_starts = np.concatenate(([0], line_ends[:-1] + 1)) if len(line_ends) else line_ends
+    spans = np.stack([line_starts, line_ends], axis=1).astype(np.int64)
+    return spans[spans[:, 1] > spans[:, 0]]
+
+
+def load_or_build_index(path: str) -> np.ndarray:
+    """Return the record spans of a JSONL file, reusing its sidecar index when it is current.
+
+    The sidecar is rebuilt whenever the file's size or modification time differs
+    from the values recorded in it. If it cannot be written (for example in a
+    read-only directory) the freshly built index is used from memory.
+    """
+    stat = os.stat(path)
+    index_path = index_path_for(path)
+
+    if os.path.exists(index_path):
+        with open(index_path, "rb") as f:
+            header = f.read(_HEADER.size)
+        if len(header) == _HEADER.size:
+            magic, version, size, mtime_ns, count = _HEADER.unpack(header)
+            if magic == _MAGIC and version == _VERSION and size == stat.st_size and mtime_ns == stat.st_mtime_ns:
+                if count == 0:
+                    return np.empty((0, 2), dtype=np.int64)
+                return np.memmap(index_path, dtype=np.int64, mode="r", offset=_HEADER.size, shape=(count, 2))
+        logging.info(f"Index {index_path} is stale, rebuilding")
+
+    if stat.st_size == 0:
+        spans = np.empty((0, 2), dtype=np.int64)
+    else:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            spans = scan_offsets(data)
+
+    try:
+        tmp_path = index_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, _VERSION, stat.st_size, stat.st_mtime_ns, len(spans)))
+            f.write(np.ascontiguousarray(spans, dtype="<i8").tobytes())
+        os.replace(tmp_path, index_path)
+    except OSError as e:
+        logging.warning(f"Could not write index {index_path}: {e}")
+    return spans
+
+
+class JsonlReader:
+    """Memory-mapped, indexed reader over a JSONL file.
+
+    Integer indexing parses one record. Slicing, `select` and `split` return new
+    readers over a subset of the records without reading any of them, so views
+    can be passed around and iterated later.
+    """
+
+    def __init__(self, path: str, _parent: Optional["JsonlReader"] = None, _rows: Optional[Sequence[int]] = None):
+        self.path = path
+        if _parent is not None:
+            self._spans = _parent._spans
+            self._data = _parent._data
+            self._file = None
+            self._rows = _rows
+            return
+
+        self._spans = load_or_build_index(path)
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self._rows = range(len(self._spans))
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __getitem__(self, key: Union[int, slice]) -> Any:
+        if isinstance(key, slice):
+            # Slicing a range or an array of rows is itself lazy
+            return JsonlReader(self.path, _parent=self, _rows=self._rows[key])
+        return json.loads(self.raw(key))
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for position in range(len(self._rows)):
+            yield self[position]
+
+    def raw(self, position: int) -> bytes:
+        """Bytes of a record without parsing it."""
+        if position < 0:
+            position += len(self._rows)
+        if not 0 <= position < len(self._rows):
+            raise IndexError(position)
+        start, end = self._spans[self._rows[position]]
+        return self._data[start:end]
+
+    def select(self, positions: Sequence[int]) -> "JsonlReader":
+        """Lazy view over the records at `positions` of this reader.
+
+        Negative positions count from the end of this view, as in indexing; positions
+        outside it raise IndexError.
+        """
+        positions = np.asarray(positions, dtype=np.int64).reshape(-1)
+        positions = np.where(positions < 0, positions + len(self._rows), positions)
+        if len(positions) and (positions.min() < 0 or positions.max() >= len(self._rows)):
+            raise IndexError(f"positions out of range for {len(self._rows)} records")
+        if isinstance(self._rows, range):
+            rows = self._rows.start + self._rows.step * positions
+        else:
+            rows = self._rows[positions]
+        return JsonlReader(self.path, _parent=self, _rows=rows)
+
+    def sample(self, count: int, seed: Optional[int] = None) -> "JsonlReader":
+        """Lazy view over `count` records chosen at random without replacement."""
+        return self.select(random.Random(seed).sample(range(len(self)), min(count, len(self))))
+
+    def split(self, eval_fraction: float = 0.1, seed: int = 0) -> Tuple["JsonlReader", "JsonlReader"]:
+        """Deterministic train/eval split of the records.
+
+        Only record positions are shuffled, so no record is read. The same file
+        and seed always give the same split.
+
+        Args:
+            eval_fraction: Share of records in the eval split.
+            seed: Seed for the shuffle.
+
+        Returns:
+            (train, eval) views, each in file order.
+        """
+        order = np.random.default_rng(seed).permutation(len(self))
+        eval_count = int(round(len(self) * eval_fraction))
+        return self.select(np.sort(order[eval_count:])), self.select(np.sort(order[:eval_count]))
+
+    def close(self) -> None:
+        """Close the file; views created from this reader stop working."""
+        if self._file is not None:
+            if isinstance(self._data, mmap.mmap):
+                self._data.close()
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> "JsonlReader":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
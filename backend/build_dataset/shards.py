@@ -0,0 +1,307 @@
+"""Pre-tokenized, packed training shards.
+
+Renders every row of a JSONL dataset with the alpaca prompt used for
+fine-tuning, tokenizes the rows in parallel across CPU cores and packs the
+token stream into fixed-length sequences. The sequences are written as raw
+token files that are opened with numpy.memmap, next to an index.json that
+describes them. The shard directory name is derived from the tokenizer, the
+context length, the template and the dataset contents, so a second build with
+the same inputs reuses the existing shards instead of tokenizing again.
+
+Usage (from backend/):
+    python -m build_dataset.shards train.jsonl --tokenizer thesleebit/journal-llm-v2 --context-length 1024
+
+    dataset = PackedTokenDataset(shard_dir)
+    for batch in dataset.iter_batches(batch_size=8):
+        ...  # batch is a read-only (8, context_length) view of the memmap
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+ALPACA_PROMPT = """Below is an instruction that describes a task, paired with an input that provides further context. Write a response that appropriately completes the request.
+
+### Instruction:
+Given a journal entry. Generate 5 follow-up questions for the user
+
+### Input:
+{}
+
+### Response:
+{}"""
+
+INDEX_FILENAME = "index.json"
+DOC_OFFSETS_FILENAME = "doc_offsets.npy"
+DEFAULT_CONTEXT_LENGTH = 1024
+DEFAULT_SEQUENCES_PER_SHARD = 1 << 16
+# Rows sent to a worker at a time
+_CHUNK_ROWS = 512
+
+_worker_tokenizer = None
+
+
+def render_example(row: Dict[str, Any]) -> str:
+    """Render a dataset row with the alpaca training prompt."""
+    output = row["output"]
+    if isinstance(output, dict):
+        output = '\n'.join([f"{questionId+1}. {q}" for questionId, q in enumerate(output["questions"])])
+    return ALPACA_PROMPT.format(row["input"], output)
+
+
+def tokenizer_fingerprint(tokenizer: Any) -> str:
+    """Hash of everything about a tokenizer that changes the ids it produces."""
+    backend = getattr(tokenizer, "backend_tokenizer", None)
+    if backend is not None:
+        definition = backend.to_str()
+    else:
+        definition = json.dumps(tokenizer.get_vocab(), sort_keys=True)
+    identity = json.dumps({
+        "class": type(tokenizer).__name__,
+        "definition": definition,
+        "special_tokens": getattr(tokenizer, "special_tokens_map", {}),
+        "eos_token_id": tokenizer.eos_token_id,
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(identity.encode("utf-8")).hexdigest()[:16]
+
+
+def file_fingerprint(path: str) -> str:
+    """Hash of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def token_dtype(tokenizer: Any) -> np.dtype:
+    """Smallest unsigned dtype that holds every token id."""
+    return np.dtype(np.uint16) if len(tokenizer) <= np.iinfo(np.uint16).max + 1 else np.dtype(np.uint32)
+
+
+def _init_worker(tokenizer: Any) -> None:
+    global _worker_tokenizer
+    # Each worker is one core already; nested Rust threads would only contend
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    _worker_tokenizer = tokenizer
+
+
+def _tokenize_chunk(texts: List[str]) -> List[List[int]]:
+    encoded = _worker_tokenizer(texts, add_special_tokens=True)["input_ids"]
+    return [ids + [_worker_tokenizer.eos_token_id] for ids in encoded]
+
+
+def build_token_shards(
+    jsonl_path: str,
+    tokenizer: Any,
+    context_length: int = DEFAULT_CONTEXT_LENGTH,
+    out_dir: Optional[str] = None,
+    num_workers: Optional[int] = None,
+    sequences_per_shard: int = DEFAULT_SEQUENCES_PER_SHARD,
+    force: bool = False
+) -> str:
+    """Tokenize a JSONL dataset into packed memmap shards, or reuse the ones already built.
+
+    Every row is rendered with ALPACA_PROMPT and terminated with the EOS token;
+    the rows are concatenated and cut into sequences of exactly `context_length`
+    tokens. The tail that does not fill a whole sequence is dropped. Document
+    start offsets in the packed stream are saved too, for callers that want to
+    reset attention at document boundaries.
+
+    Args:
+        jsonl_path: Dataset with "input" and "output" fields.
+        tokenizer: Hugging Face tokenizer (picklable, as fast tokenizers are).
+        context_length: Tokens per packed sequence.
+        out_dir: Directory holding shard directories (default: "shards" next to the dataset).
+        num_workers: Tokenizer processes (default: all CPU cores).
+        sequences_per_shard: Sequences per shard file.
+        force: Rebuild even if matching shards exist.
+
+    Returns:
+        Path of the shard directory.
+    """
+    out_dir = out_dir or os.path.join(os.path.dirname(os.path.abspath(jsonl_path)), "shards")
+    key = hashlib.sha256("\0".join([
+        tokenizer_fingerprint(tokenizer),
+        str(context_length),
+        hashlib.sha256(ALPACA_PROMPT.encode("utf-8")).hexdigest(),
+        file_fingerprint(jsonl_path),
+    ]).encode("utf-8")).hexdigest()[:16]
+    stem = os.path.splitext(os.path.basename(jsonl_path))[0]
+    shard_dir = os.path.join(out_dir, f"{stem}-{key}")
+    index_path = os.path.join(shard_dir, INDEX_FILENAME)
+
+    if os.path.exists(index_path) and not force:
+        logging.info(f"Reusing token shards in {shard_dir}")
+        return shard_dir
+
+    start = time.perf_counter()
+    os.makedirs(shard_dir, exist_ok=True)
+    if os.path.exists(index_path):
+        # A forced rebuild invalidates the old shards until the new index is written
+        os.remove(index_path)
+    with open(jsonl_path, "r") as f:
+        texts = [render_example(json.loads(line)) for line in f if line.strip()]
+    chunks = [texts[i:i + _CHUNK_ROWS] for i in range(0, len(texts), _CHUNK_ROWS)]
+
+    dtype = token_dtype(tokenizer)
+    shards: List[Dict[str, Any]] = []
+    doc_offsets: List[int] = []
+    pending: List[np.ndarray] = []
+    pending_tokens = 0
+    total_tokens = 0
+    shard_file = None
+    shard_sequences = 0
+
+    def write_sequences(tokens: np.ndarray) -> None:
+        """Append whole sequences to the current shard, opening a new one when it is full."""
+        nonlocal shard_file, shard_sequences
+        sequences = tokens.reshape(-1, context_length)
+        while len(sequences):
+            if shard_file is None:
+                name = f"shard_{len(shards):05d}.bin"
+                shards.append({"file": name, "sequences": 0})
+                shard_file = open(os.path.join(shard_dir, name), "wb")
+                shard_sequences = 0
+            take = min(len(sequences), sequences_per_shard - shard_sequences)
+            shard_file.write(sequences[:take].tobytes())
+            shard_sequences += take
+            shards[-1]["sequences"] = shard_sequences
+            sequences = sequences[take:]
+            if shard_sequences == sequences_per_shard:
+                shard_file.close()
+                shard_file = None
+
+    workers = num_workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(tokenizer,)) as executor:
+        # map keeps chunk order, so the shards are identical from run to run
+        for encoded in executor.map(_tokenize_chunk, chunks):
+            for ids in encoded:
+                doc_offsets.append(total_tokens)
+                total_tokens += len(ids)
+                pending.append(np.asarray(ids, dtype=dtype))
+                pending_tokens += len(ids)
+            if pending_tokens >= context_length:
+                stream = np.concatenate(pending)
+                full = (len(stream) // context_length) * context_length
+                write_sequences(stream[:full])
+                pending = [stream[full:]]
+                pending_tokens = len(pending[0])
+    if shard_file is not None:
+        shard_file.close()
+
+    np.save(os.path.join(shard_dir, DOC_OFFSETS_FILENAME), np.asarray(doc_offsets, dtype=np.int64))
+    index = {
+        "source": os.path.abspath(jsonl_path),
+        "tokenizer": tokenizer_fingerprint(tokenizer),
+        "context_length": context_length,
+        "dtype": dtype.name,
+        "documents": len(texts),
+        "tokens": total_tokens,
+        "dropped_tail_tokens": pending_tokens,
+        "sequences": sum(shard["sequences"] for shard in shards),
+        "shards": shards,
+    }
+    # The index is written last and atomically; its presence marks a complete build
+    tmp_path = index_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp_path, index_path)
+
+    logging.info(
+        f"Packed {len(texts)} rows ({total_tokens} tokens) into {index['sequences']} sequences "
+        f"of {context_length} tokens in {time.perf_counter() - start:.1f}s → {shard_dir}"
+    )
+    return shard_dir
+
+
+class PackedTokenDataset:
+    """Read-only view over packed token shards.
+
+    Shards are opened with numpy.memmap, so indexing and contiguous batches are
+    views into the page cache: nothing is copied until the caller does so (for
+    example torch.from_numpy(batch).long() when moving a batch to the GPU).
+    """
+
+    def __init__(self, shard_dir: str):
+        with open(os.path.join(shard_dir, INDEX_FILENAME), "r") as f:
+            self.index = json.load(f)
+        self.shard_dir = shard_dir
+        self.context_length = self.index["context_length"]
+        dtype = np.dtype(self.index["dtype"])
+        self._shards = [
+            np.memmap(os.path.join(shard_dir, shard["file"]), dtype=dtype, mode="r",
+                      shape=(shard["sequences"], self.context_length))
+            for shard in self.index["shards"] if shard["sequences"]
+        ]
+        self._starts = np.cumsum([0] + [len(shard) for shard in self._shards])
+
+    def __len__(self) -> int:
+        return int(self._starts[-1])
+
+    def __getitem__(self, index: int) -> np.ndarray:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        shard = int(np.searchsorted(self._starts, index, side="right")) - 1
+        return self._shards[shard][index - self._starts[shard]]
+
+    def doc_offsets(self) -> np.ndarray:
+        """Start offset of every document in the packed token stream."""
+        return np.load(os.path.join(self.shard_dir, DOC_OFFSETS_FILENAME), mmap_mode="r")
+
+    def iter_batches(self, batch_size: int, shuffle: bool = False, seed: int = 0,
+                     drop_last: bool = False) -> Iterator[np.ndarray]:
+        """Yield (batch_size, context_length) batches as memmap views.
+
+        Batches never span two shards, so each one is a contiguous slice. With
+        `shuffle`, the order of the batches is shuffled rather than the
+        sequences inside them, which keeps every batch a zero-copy view.
+
+        Args:
+            batch_size: Sequences per batch.
+            shuffle: Visit batches in a random order.
+            seed: Seed for the shuffle.
+            drop_last: Skip a short final batch of a shard.
+        """
+        slices = []
+        for shard_number, shard in enumerate(self._shards):
+            for start in range(0, len(shard), batch_size):
+                if drop_last and start + batch_size > len(shard):
+                    continue
+                slices.append((shard_number, start))
+        if shuffle:
+            np.random.default_rng(seed).shuffle(slices)
+        for shard_number, start in slices:
+            yield self._shards[shard_number][start:start + batch_size]
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="JSONL dataset to tokenize")
+    parser.add_argument("--tokenizer", required=True, help="Tokenizer name or path for AutoTokenizer")
+    parser.add_argument("--context-length", type=int, default=DEFAULT_CONTEXT_LENGTH)
+    parser.add_argument("--out-dir", default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--force", action="store_true", help="Rebuild even if matching shards exist")
+    args = parser.parse_args()
+
+    from transformers import AutoTokenizer
+
+    shard_dir = build_token_shards(
+        args.path,
+        AutoTokenizer.from_pretrained(args.tokenizer),
+        context_length=args.context_length,
+        out_dir=args.out_dir,
+        num_workers=args.workers,
+        force=args.force
+    )
+    print(f"✅ Token shards → {shard_dir}")
@@ -32,6 +32,33 @@ class Settings(BaseSettings):
     HUGGINGFACE_LOAD_IN_4BIT: bool = True
     HUGGINGFACE_DEVICE_MAP: str = "auto"
     HUGGINGFACE_MAX_NEW_TOKENS: int = 512
+    HUGGINGFACE_MAX_WORKERS: int = 1  # Threads allowed to run local inference at once
+    HUGGINGFACE_BATCH_MAX_SIZE: int = 8  # Prompts per batched generate call; 1 disables micro-batching
+    HUGGINGFACE_BATCH_MAX_WAIT_MS: float = 10.0  # How long a prompt waits for others to join its batch
+    
+    # Admission control for outbound LLM calls, applied per provider
+    LLM_MAX_IN_FLIGHT: int = 16  # Concurrent calls to one provider
+    LLM_RATE_PER_SECOND: float = 10.0  # Sustained call starts per second; 0 disables pacing
+    LLM_RATE_BURST: int = 20
+    LLM_MAX_QUEUE: int = 64  # Callers allowed to wait; beyond this the API answers 503
+    LLM_MAX_QUEUE_WAIT_SECONDS: float = 15.0
+    
+    # Analysis cache settings
+    ANALYSIS_CACHE_ENABLED: bool = True
+    ANALYSIS_CACHE_MAX_ENTRIES: int = 1024
+    ANALYSIS_CACHE_TTL_SECONDS: int = 7 * 24 * 60 * 60
+    ANALYSIS_CACHE_MONGO_ENABLED: bool = True  # Share cached analyses across workers
+    
+    # Bulk analysis settings
+    BATCH_ANALYSIS_CONCURRENCY: int = 4  # Analyses of one import running at once
+    BATCH_ANALYSIS_BACKGROUND_THRESHOLD: int = 50  # Larger imports always run as a background task
+    
+    # Job queue settings
+    JOB_WORKERS_ENABLED: bool = True
+    JOB_WORKER_CONCURRENCY: int = 4  # Jobs one API process runs at once
+    JOB_LEASE_SECONDS: int = 120  # A job whose worker stops renewing for this long is reclaimed
+    JOB_POLL_INTERVAL_SECONDS: float = 1.0
+    JOB_MAX_ATTEMPTS: int = 3
     
     # Application paths
     TMP_DIR: str = os.path.join(os.getcwd(), "tmp")
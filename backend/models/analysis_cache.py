@@ -0,0 +1,24 @@
+from datetime import datetime
+from typing import List
+from beanie import Document
+from pydantic import Field
+from pymongo import ASCENDING, IndexModel
+
+class CachedAnalysis(Document):
+    """Journal analysis cached by normalized entry text, provider and model"""
+    key: str = Field(..., description="Hash of the normalized entry text, provider and model")
+    provider: str
+    model: str
+    mood: str
+    mood_score: float
+    questions: List[str]
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: datetime = Field(..., description="MongoDB removes the document after this time")
+
+    class Settings:
+        name = "analysis_cache"
+        indexes = [
+            IndexModel([("key", ASCENDING)], unique=True),
+            # expireAfterSeconds=0 makes MongoDB expire each document at its own expires_at
+            IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+        ]
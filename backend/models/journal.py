@@ -2,6 +2,7 @@ from datetime import datetime
 from typing import List, Optional
 from beanie import Document
 from pydantic import BaseModel, Field
+from pymongo import ASCENDING, DESCENDING, IndexModel
 import uuid
 
 class JournalEntry(BaseModel):
@@ -27,11 +28,24 @@ class Journal(Document):
     mood_score: float = Field(..., description="Mood score from -10 (very negative) to 10 (very positive)")
     questions: List[str] = Field(..., description="Follow-up questions generated for the entry")
     answers: List[Optional[str]] = Field(default_factory=list, description="User's answers to the follow-up questions")
+    idempotency_key: Optional[str] = Field(None, description="Client-supplied Idempotency-Key of the request that created the entry")
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     
     class Settings:
         name = "journals"
+        indexes = [
+            IndexModel([("journal_id", ASCENDING)], unique=True),
+            IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)]),
+            # History listing pages through every journal by (created_at, journal_id) without a user filter
+            IndexModel([("created_at", DESCENDING), ("journal_id", DESCENDING)]),
+            # Only requests that sent an Idempotency-Key are indexed, so unkeyed entries never collide
+            IndexModel(
+                [("idempotency_key", ASCENDING)],
+                unique=True,
+                partialFilterExpression={"idempotency_key": {"$gt": ""}}
+            ),
+        ]
         
     class Config:
         schema_extra = {
@@ -58,6 +72,32 @@ class Journal(Document):
             }
         }
 
+# Characters of the entry shown in the history list
+JOURNAL_SUMMARY_ENTRY_LENGTH = 140
+
+class JournalSummary(BaseModel):
+    """Projection of a journal for the history list, computed by MongoDB"""
+    id: str
+    date: datetime
+    mood: Optional[str] = None
+    mood_score: Optional[float] = None
+    entry: str = Field(..., description="Start of the journal entry text")
+    answered_count: int = Field(0, description="Number of follow-up questions answered")
+
+    class Settings:
+        projection = {
+            "_id": 0,
+            "id": "$journal_id",
+            "date": "$created_at",
+            "mood": 1,
+            "mood_score": 1,
+            "entry": {"$substrCP": ["$entry", 0, JOURNAL_SUMMARY_ENTRY_LENGTH]},
+            "answered_count": {"$size": {"$filter": {
+                "input": {"$ifNull": ["$answers", []]},
+                "cond": {"$and": [{"$ne": ["$$this", None]}, {"$ne": ["$$this", ""]}]}
+            }}}
+        }
+
 class UserStreak(Document):
     """User streak document model"""
     user_id: str
@@ -66,3 +106,6 @@ class UserStreak(Document):
     
     class Settings:
         name = "user_streaks"
+        indexes = [
+            IndexModel([("user_id", ASCENDING)], unique=True),
+        ]
@@ -3,6 +3,7 @@ from enum import Enum
 from typing import Optional, Dict, Any
 from beanie import Document
 from pydantic import BaseModel, Field
+from pymongo import ASCENDING, IndexModel
 import uuid
 
 class TaskStatus(str, Enum):
@@ -16,9 +17,31 @@ class Task(Document):
     status: TaskStatus = Field(default=TaskStatus.PENDING)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
+    progress: float = Field(default=0.0, description="Fraction of the work done, from 0 to 1")
     result: Optional[Dict[str, Any]] = None
     error: Optional[str] = None
     agent_run_id: Optional[str] = None
+    # Durable job queue fields, set for tasks run by the worker pool
+    kind: Optional[str] = Field(default=None, description="Job handler that runs the task")
+    payload: Optional[Dict[str, Any]] = None
+    attempts: int = 0
+    available_at: Optional[datetime] = Field(default=None, description="Earliest time a pending job may be claimed")
+    worker_id: Optional[str] = None
+    lease_expires_at: Optional[datetime] = Field(default=None, description="A running job whose lease expires is reclaimed")
     
     class Settings:
         name = "tasks"
+        indexes = [
+            IndexModel([("task_id", ASCENDING)], unique=True),
+            # Claim queries: pending jobs that are due, and running jobs whose lease expired
+            IndexModel([("status", ASCENDING), ("available_at", ASCENDING)]),
+            IndexModel([("status", ASCENDING), ("lease_expires_at", ASCENDING)]),
+        ]
+
+class TaskProgress(BaseModel):
+    """Projection of a task for status polling, leaving out the potentially large result"""
+    task_id: str
+    status: TaskStatus
+    progress: float = 0.0
+    error: Optional[str] = None
+    updated_at: datetime
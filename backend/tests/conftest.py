@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Import backend modules the way the app does, relative to backend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Settings require a key; tests never call the API
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
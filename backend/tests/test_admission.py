@@ -0,0 +1,116 @@
+"""Tests for LLM admission control."""
+import asyncio
+from contextlib import AsyncExitStack
+
+import pytest
+
+pytest.importorskip("pydantic_settings")
+
+from utils.admission import AdmissionController, OverloadedError
+
+
+def controller(max_in_flight=2, rate_per_second=0.0, burst=1, max_queue=100, max_wait_seconds=1.0):
+    return AdmissionController("test", max_in_flight, rate_per_second, burst, max_queue, max_wait_seconds)
+
+
+async def assert_all_slots_free(admission):
+    """Every slot can be taken at once, so none leaked."""
+    async with AsyncExitStack() as stack:
+        for _ in range(admission.max_in_flight):
+            await stack.enter_async_context(admission.acquire())
+        assert admission.in_flight == admission.max_in_flight
+    assert admission.queue_depth == 0
+
+
+def test_burst_under_max_in_flight_is_never_shed():
+    admission = controller(max_in_flight=16, max_queue=4)
+
+    async def call():
+        async with admission.acquire():
+            await asyncio.sleep(0.01)
+
+    async def run():
+        await asyncio.gather(*(call() for _ in range(10)))
+
+    asyncio.run(run())
+    assert admission.admitted == 10
+    assert admission.rejected == 0
+
+
+def test_full_queue_is_shed():
+    admission = controller(max_in_flight=1, max_queue=1)
+    release = asyncio.Event()
+
+    async def hold():
+        async with admission.acquire():
+            await release.wait()
+
+    async def run():
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        assert admission.queue_depth == 1
+        with pytest.raises(OverloadedError, match="wait queue is full"):
+            async with admission.acquire():
+                pass
+        release.set()
+        await asyncio.gather(holder, waiter)
+        assert admission.admitted == 2
+        await assert_all_slots_free(admission)
+
+    asyncio.run(run())
+
+
+def test_timeouts_and_cancellations_never_leak_slots():
+    admission = controller(max_in_flight=2, max_wait_seconds=0.02)
+
+    async def call():
+        async with admission.acquire():
+            await asyncio.sleep(0.01)
+
+    async def run():
+        tasks = [asyncio.create_task(call()) for _ in range(200)]
+        await asyncio.sleep(0.005)
+        for task in tasks[::3]:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await assert_all_slots_free(admission)
+
+    asyncio.run(run())
+    assert admission.rejected > 0
+
+
+def test_cancelled_pacing_returns_the_token_and_the_slot():
+    admission = controller(max_in_flight=1, rate_per_second=1.0, burst=1, max_wait_seconds=5.0)
+
+    async def run():
+        async with admission.acquire():
+            pass  # Uses the only token in the bucket
+        paced = asyncio.create_task(admission.acquire().__aenter__())
+        await asyncio.sleep(0.01)
+        assert admission.queue_depth == 1
+        paced.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await paced
+        assert admission.queue_depth == 0
+        assert not admission._slots.locked()
+        # Had the cancelled caller kept its token, the next one would owe two seconds
+        assert admission._bucket.reserve() <= 1.0
+
+    asyncio.run(run())
+
+
+def test_rate_limit_beyond_the_wait_budget_is_shed():
+    admission = controller(max_in_flight=4, rate_per_second=1.0, burst=1, max_wait_seconds=0.1)
+
+    async def run():
+        async with admission.acquire():
+            pass
+        with pytest.raises(OverloadedError, match="rate limit reached"):
+            async with admission.acquire():
+                pass
+        await asyncio.sleep(0)
+        assert not admission._slots.locked()
+
+    asyncio.run(run())
@@ -0,0 +1,58 @@
+"""Tests for near-duplicate detection."""
+import pytest
+
+pytest.importorskip("numpy")
+
+from build_dataset.dedup import dedup_rows, find_near_duplicates
+from build_dataset.utils import FALLBACK_QUESTIONS, fallback_entry
+
+BASE = "today i finally finished the marathon i had been training for since last spring and my legs ache"
+
+
+def test_near_duplicates_are_clustered():
+    texts = [
+        BASE,
+        "I moved to a new city for work and I miss my old friends a lot already",
+        BASE + " badly",
+        "My sister had her first baby and I held my niece for the very first time",
+        BASE.upper(),
+    ]
+    assert find_near_duplicates(texts) == [[0, 2, 4]]
+
+
+def test_distinct_texts_have_no_clusters():
+    texts = [f"event number {i} happened with details {i * 7} and {i * 13} only once" for i in range(50)]
+    assert find_near_duplicates(texts, threshold=0.9) == []
+    assert find_near_duplicates([BASE]) == []
+
+
+def test_clusters_are_deterministic():
+    texts = [BASE, BASE + " again", "something else entirely different from the rest"] * 3
+    assert find_near_duplicates(texts) == find_near_duplicates(texts)
+    assert find_near_duplicates(texts) == [[0, 1, 3, 4, 6, 7], [2, 5, 8]]
+
+
+def test_short_texts_are_compared():
+    assert find_near_duplicates(["hi", "hi", "bye"]) == [[0, 1]]
+
+
+def test_dedup_rows_drops_fallbacks_and_later_duplicates():
+    rows = [
+        {"input": BASE, "output": "1. How did it feel?\n2. What kept you going?"},
+        {"input": "I started learning the piano at forty and it is harder than I hoped", "output": "1. Why now?"},
+        {"input": BASE + " badly", "output": "1. Something unrelated to ask about?"},
+        {"input": fallback_entry("a job loss"), "output": {"questions": list(FALLBACK_QUESTIONS)}},
+        {"input": fallback_entry("a wedding"), "output": "1. What changed?", "fallback": True},
+        {"input": "I adopted a rescue dog who is scared of everything including the kettle",
+         "output": {"questions": ["How did it feel?", "What kept you going?"]}},
+    ]
+    kept, report = dedup_rows(rows)
+
+    assert kept == [rows[0], rows[1]]
+    assert report["fallback_rows"] == [3, 4]
+    assert report["dropped_rows"] == [2, 3, 4, 5]
+    assert report["kept_rows"] == 2
+    # Numbered text and question lists compare the same
+    assert report["fields"]["output"]["duplicate_rows"] == 1
+    assert report["fields"]["input"]["clusters"] == 1
+    assert report["fields"]["input"]["examples"][0]["rows"] == [0, 2]
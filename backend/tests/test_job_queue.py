@@ -0,0 +1,65 @@
+"""Tests for the job worker pool."""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("beanie")
+
+from pymongo.errors import AutoReconnect
+
+from utils import job_queue
+from utils.job_queue import JobWorkerPool
+from utils.task_manager import TaskManager
+
+
+def make_job(task_id):
+    return SimpleNamespace(task_id=task_id, kind="test_job", payload={}, attempts=1, error=None)
+
+
+def test_worker_survives_a_failed_bookkeeping_write(monkeypatch):
+    jobs = [make_job("first"), make_job("second")]
+    handled = []
+    recorded = []
+
+    @job_queue.job_handler("test_job")
+    async def handler(payload, progress):
+        return {}
+
+    async def claim_task(kinds, worker_id, lease_seconds):
+        return jobs.pop(0) if jobs else None
+
+    async def transition_task(task_id, status, **fields):
+        handled.append(task_id)
+        if task_id == "first":
+            raise AutoReconnect("connection reset")
+        recorded.append(task_id)
+
+    async def release_tasks(worker_id):
+        return 0
+
+    monkeypatch.setattr(TaskManager, "claim_task", claim_task)
+    monkeypatch.setattr(TaskManager, "transition_task", transition_task)
+    monkeypatch.setattr(TaskManager, "release_tasks", release_tasks)
+
+    async def run():
+        pool = JobWorkerPool(concurrency=1, lease_seconds=60, poll_interval=0.01, max_attempts=3)
+        await pool.start()
+        for _ in range(100):
+            if recorded:
+                break
+            await asyncio.sleep(0.01)
+        stats = pool.stats()
+        await pool.stop()
+        return stats
+
+    try:
+        stats = asyncio.run(run())
+    finally:
+        job_queue._handlers.pop("test_job", None)
+
+    # The write for the first job failed, yet the same worker went on to the second one
+    assert handled == ["first", "second"]
+    assert recorded == ["second"]
+    assert stats["workers_alive"] == 1
+    assert stats["running"] == 0
@@ -0,0 +1,108 @@
+"""Tests for the streaming JSON extractor."""
+import json
+
+import pytest
+
+from utils.json_stream import StreamingJSONExtractor
+
+ANALYSIS = {
+    "mood": "hopeful \"but\" tired\\",
+    "mood_score": 72,
+    "questions": ["What helped?", "Line\nbreak?", "Tab\there?", "Unicode é?", "Last one?"],
+    "done": True,
+    "note": None,
+}
+
+
+def feed_in_chunks(text, size):
+    """Feed `text` `size` characters at a time and return the events and the extractor."""
+    extractor = StreamingJSONExtractor()
+    events = []
+    for start in range(0, len(text), size):
+        events.extend(extractor.feed(text[start:start + size]))
+    events.extend(extractor.finish())
+    return events, extractor
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 7, 64, 10_000])
+def test_any_chunking_gives_the_same_result(size):
+    text = "Sure! Here it is:\n" + json.dumps(ANALYSIS) + "\nHope that helps."
+    events, extractor = feed_in_chunks(text, size)
+
+    assert extractor.result == ANALYSIS
+    assert [event for event in events if event[0] == "questions" and event[1] is not None] == [
+        ("questions", index, question) for index, question in enumerate(ANALYSIS["questions"])
+    ]
+    assert ("mood", None, ANALYSIS["mood"]) in events
+    assert ("mood_score", None, 72) in events
+
+
+def test_split_inside_escape():
+    extractor = StreamingJSONExtractor()
+    assert extractor.feed('{"mood": "say \\') == []
+    assert extractor.feed('"hi\\" now", "x": 1}') == [("mood", None, 'say "hi" now'), ("x", None, 1)]
+    assert extractor.result == {"mood": 'say "hi" now', "x": 1}
+
+
+def test_scalar_split_across_chunks_is_not_reported_early():
+    extractor = StreamingJSONExtractor()
+    assert extractor.feed('{"mood_score": 4') == []
+    assert extractor.feed('2') == []
+    assert extractor.feed('.5, "ok": tr') == [("mood_score", None, 42.5)]
+    assert extractor.feed('ue}') == [("ok", None, True)]
+
+
+def test_trailing_scalar_is_flushed_by_finish():
+    extractor = StreamingJSONExtractor()
+    assert extractor.feed('{"a": [1, 2') == [("a", 0, 1)]
+    assert extractor.finish() == [("a", 1, 2)]
+    # The object never closed
+    assert extractor.result is None
+
+
+def test_think_block_is_skipped():
+    text = '<think>Maybe {"mood": "wrong"} fits?</think>\n{"mood": "calm", "questions": []}'
+    _, extractor = feed_in_chunks(text, 3)
+    assert extractor.result == {"mood": "calm", "questions": []}
+
+
+def test_think_tag_split_across_chunks():
+    extractor = StreamingJSONExtractor()
+    for chunk in ["<th", "ink>{\"a\": 1}</thi", "nk>", '{"b": 2}']:
+        extractor.feed(chunk)
+    assert extractor.result == {"b": 2}
+
+
+def test_code_fence_is_skipped():
+    text = '```json\n{\n  "mood": "sad",\n  "questions": ["Why?"]\n}\n```'
+    _, extractor = feed_in_chunks(text, 4)
+    assert extractor.result == {"mood": "sad", "questions": ["Why?"]}
+
+
+def test_trailing_commas_and_raw_newlines_are_tolerated():
+    text = '{"questions": ["one", "two\nlines",], "nested": {"a": [1, 2,],},}'
+    events, extractor = feed_in_chunks(text, 5)
+    assert extractor.result == {"questions": ["one", "two\nlines"], "nested": {"a": [1, 2]}}
+    assert ("questions", 1, "two\nlines") in events
+
+
+def test_invalid_candidate_is_skipped():
+    text = 'Use {braces} like {this}. Answer: {"mood": "ok"}'
+    _, extractor = feed_in_chunks(text, 2)
+    assert extractor.result == {"mood": "ok"}
+    assert StreamingJSONExtractor.extract(text) == {"mood": "ok"}
+
+
+def test_no_object():
+    _, extractor = feed_in_chunks("no json here", 3)
+    assert extractor.result is None
+    assert StreamingJSONExtractor.extract('{"unterminated": "value') is None
+
+
+def test_extract_json_from_string_delegates_to_the_extractor():
+    helper = pytest.importorskip("utils.helper")
+    text = '<think>{"x": 1}</think>```json\n{"mood": "ok", "questions": ["a",],}\n```'
+    assert helper.extract_json_from_string(text) == StreamingJSONExtractor.extract(text) == {
+        "mood": "ok", "questions": ["a"]
+    }
+    assert helper.extract_json_from_string("nothing") is None
@@ -0,0 +1,119 @@
+"""Tests for the indexed JSONL reader."""
+import json
+import os
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from build_dataset.jsonl_index import JsonlReader, index_path_for
+
+
+def write_rows(path, rows, trailing_newline=True):
+    text = "\n".join(json.dumps(row) for row in rows)
+    path.write_text(text + ("\n" if trailing_newline else ""))
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    path = tmp_path / "train.jsonl"
+    write_rows(path, [{"id": i} for i in range(10)])
+    return str(path)
+
+
+def ids(reader):
+    return [row["id"] for row in reader]
+
+
+def test_reads_records_by_position(dataset):
+    with JsonlReader(dataset) as reader:
+        assert len(reader) == 10
+        assert reader[0] == {"id": 0}
+        assert reader[-1] == {"id": 9}
+        assert ids(reader) == list(range(10))
+        with pytest.raises(IndexError):
+            reader[10]
+
+
+def test_blank_lines_and_missing_trailing_newline(tmp_path):
+    path = tmp_path / "data.jsonl"
+    path.write_text('{"id": 0}\n\n{"id": 1}\n{"id": 2}')
+    with JsonlReader(str(path)) as reader:
+        assert ids(reader) == [0, 1, 2]
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / "empty.jsonl"
+    path.write_text("")
+    with JsonlReader(str(path)) as reader:
+        assert len(reader) == 0
+        assert list(reader) == []
+
+
+def test_slices_and_select_are_relative_to_the_view(dataset):
+    with JsonlReader(dataset) as reader:
+        view = reader[2:8:2]
+        assert ids(view) == [2, 4, 6]
+        assert ids(view[1:]) == [4, 6]
+        # Negative positions count from the end of the view, not of the file
+        assert ids(reader[1:].select([-1, 0])) == [9, 1]
+        assert ids(view.select([2]).select([0])) == [6]
+
+
+def test_select_out_of_range_raises(dataset):
+    with JsonlReader(dataset) as reader:
+        with pytest.raises(IndexError):
+            reader[5:].select([5])
+        with pytest.raises(IndexError):
+            reader[5:].select([-6])
+
+
+def test_index_is_reused_while_the_file_is_unchanged(dataset):
+    with JsonlReader(dataset):
+        pass
+    index_path = index_path_for(dataset)
+    built = os.stat(index_path).st_mtime_ns
+    with JsonlReader(dataset) as reader:
+        assert len(reader) == 10
+    assert os.stat(index_path).st_mtime_ns == built
+
+
+def test_index_is_rebuilt_when_the_file_grows(dataset):
+    with JsonlReader(dataset):
+        pass
+    with open(dataset, "a") as f:
+        f.write(json.dumps({"id": 10}) + "\n")
+    with JsonlReader(dataset) as reader:
+        assert len(reader) == 11
+        assert reader[-1] == {"id": 10}
+
+
+def test_index_is_rebuilt_when_only_the_mtime_changes(tmp_path):
+    path = tmp_path / "data.jsonl"
+    path.write_text('{"id": 1}\n{"id": 2}\n')
+    with JsonlReader(str(path)) as reader:
+        assert len(reader) == 2
+    # Same size, different line breaks
+    stat = os.stat(path)
+    path.write_text('{"id": 1}{"id":2}\n\n\n')
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert os.stat(path).st_size == stat.st_size
+    with JsonlReader(str(path)) as reader:
+        assert len(reader) == 1
+
+
+def test_split_is_deterministic_and_disjoint(tmp_path):
+    path = tmp_path / "data.jsonl"
+    write_rows(path, [{"id": i} for i in range(100)])
+    with JsonlReader(str(path)) as reader:
+        train, eval_ = reader.split(eval_fraction=0.2, seed=3)
+        again_train, again_eval = reader.split(eval_fraction=0.2, seed=3)
+        other_train, _ = reader.split(eval_fraction=0.2, seed=4)
+
+        assert len(train) == 80 and len(eval_) == 20
+        assert ids(train) == ids(again_train) and ids(eval_) == ids(again_eval)
+        assert ids(train) != ids(other_train)
+        assert not set(ids(train)) & set(ids(eval_))
+        assert sorted(ids(train) + ids(eval_)) == list(range(100))
+        # Each split keeps file order
+        assert ids(train) == sorted(ids(train))
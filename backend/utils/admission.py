@@ -0,0 +1,209 @@
+"""
+Admission control for outbound LLM calls.
+
+Each provider gets an AdmissionController that caps the number of calls in
+flight, paces call starts with a token bucket and bounds how many callers may
+wait. When the wait queue is full, or a caller would wait longer than allowed,
+the call is shed with OverloadedError, which the API turns into a 503 with a
+Retry-After header instead of letting requests pile up until they all time out.
+"""
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict
+
+from config import settings
+
+
+class OverloadedError(Exception):
+    """Raised when a call is shed because the provider is saturated."""
+
+    def __init__(self, name: str, retry_after: float, reason: str):
+        super().__init__(f"{name} is overloaded: {reason}")
+        self.name = name
+        self.retry_after = retry_after
+        self.reason = reason
+
+    @property
+    def retry_after_header(self) -> str:
+        """Retry-After value in whole seconds."""
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class TokenBucket:
+    """Token bucket that hands out reservations, so waiters are paced in arrival order."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+
+    def reserve(self) -> float:
+        """Take a token and return how many seconds to wait before it may be used."""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self._tokens -= 1
+        # A negative balance means the token is borrowed from the future
+        return max(0.0, -self._tokens / self.rate)
+
+    def cancel(self) -> None:
+        """Give back a reservation that will not be used."""
+        self._tokens = min(self.burst, self._tokens + 1)
+
+
+class AdmissionController:
+    """Limit in-flight calls, their start rate and the queue of callers waiting for a slot."""
+
+    def __init__(
+        self,
+        name: str,
+        max_in_flight: int,
+        rate_per_second: float,
+        burst: int,
+        max_queue: int,
+        max_wait_seconds: float
+    ):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_wait_seconds = max_wait_seconds
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._bucket = TokenBucket(rate_per_second, burst)
+        self.in_flight = 0
+        self.queue_depth = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.total_wait_seconds = 0.0
+        self.max_observed_wait_seconds = 0.0
+        # Smoothed call duration, used to estimate Retry-After
+        self.avg_call_seconds = 1.0
+
+    def retry_after(self) -> float:
+        """Estimate how long it takes for the current queue to drain."""
+        return (self.queue_depth + 1) * self.avg_call_seconds / self.max_in_flight
+
+    def ensure_capacity(self) -> None:
+        """Reject right away if a new caller could not even join the queue."""
+        if self.queue_depth >= self.max_queue:
+            self.rejected += 1
+            raise OverloadedError(self.name, self.retry_after(), "wait queue is full")
+
+    async def _acquire_slot(self, timeout: float) -> None:
+        """Take an in-flight slot, raising OverloadedError after `timeout` seconds.
+
+        The acquire runs shielded, so a timeout or cancellation that lands just as
+        the slot is granted can still see that it was granted and hand it back.
+        """
+        acquire = asyncio.ensure_future(self._slots.acquire())
+        try:
+            await asyncio.wait_for(asyncio.shield(acquire), timeout)
+        except BaseException as e:
+            if acquire.done() and not acquire.cancelled() and acquire.exception() is None:
+                self._slots.release()
+            else:
+                # Semaphore.acquire passes a slot granted at the moment of cancellation on itself
+                acquire.cancel()
+            if isinstance(e, asyncio.TimeoutError):
+                self.rejected += 1
+                raise OverloadedError(self.name, self.retry_after(), "timed out waiting for a slot")
+            raise
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[None]:
+        """Wait for admission, then hold an in-flight slot for the duration of the block.
+
+        Only callers that find every slot taken join the wait queue, so a burst that
+        fits under max_in_flight is never shed for a full queue.
+        """
+        start = time.monotonic()
+        if self._slots.locked():
+            self.ensure_capacity()
+            self.queue_depth += 1
+            try:
+                await self._acquire_slot(self.max_wait_seconds)
+            finally:
+                self.queue_depth -= 1
+        else:
+            # A slot is free, and Semaphore.acquire takes it without yielding to the loop
+            await self._slots.acquire()
+
+        admitted = False
+        reserved = False
+        try:
+            delay = self._bucket.reserve()
+            reserved = True
+            remaining = self.max_wait_seconds - (time.monotonic() - start)
+            if delay > remaining:
+                self.rejected += 1
+                raise OverloadedError(self.name, delay, "rate limit reached")
+            if delay > 0:
+                # Paced callers are waiting too, which Retry-After estimates should reflect
+                self.queue_depth += 1
+                try:
+                    await asyncio.sleep(delay)
+                finally:
+                    self.queue_depth -= 1
+            admitted = True
+        finally:
+            if not admitted:
+                # Shed or cancelled while paced: the token and the slot go unused
+                if reserved:
+                    self._bucket.cancel()
+                self._slots.release()
+
+        waited = time.monotonic() - start
+        self.admitted += 1
+        self.total_wait_seconds += waited
+        self.max_observed_wait_seconds = max(self.max_observed_wait_seconds, waited)
+
+        self.in_flight += 1
+        call_start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+            self.avg_call_seconds = 0.8 * self.avg_call_seconds + 0.2 * (time.monotonic() - call_start)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, wait time and shedding counters."""
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queue_depth": self.queue_depth,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "avg_wait_seconds": self.total_wait_seconds / self.admitted if self.admitted else 0.0,
+            "max_wait_seconds": self.max_observed_wait_seconds,
+            "avg_call_seconds": self.avg_call_seconds,
+        }
+
+
+_controllers: Dict[str, AdmissionController] = {}
+
+
+def get_admission_controller(provider: str) -> AdmissionController:
+    """Get the admission controller for a model provider, creating it on first use."""
+    controller = _controllers.get(provider)
+    if controller is None:
+        controller = AdmissionController(
+            name=provider,
+            max_in_flight=settings.LLM_MAX_IN_FLIGHT,
+            rate_per_second=settings.LLM_RATE_PER_SECOND,
+            burst=settings.LLM_RATE_BURST,
+            max_queue=settings.LLM_MAX_QUEUE,
+            max_wait_seconds=settings.LLM_MAX_QUEUE_WAIT_SECONDS
+        )
+        _controllers[provider] = controller
+    return controller
+
+
+def admission_stats() -> Dict[str, Dict[str, Any]]:
+    """Metrics for every provider that has been called."""
+    return {provider: controller.stats() for provider, controller in _controllers.items()}
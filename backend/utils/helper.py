@@ -6,12 +6,11 @@ import random
 import re
 import traceback
 from typing import Callable, Optional, TypeVar, ParamSpec
-from langchain_core.runnables import RunnableLambda
-from langgraph.prebuilt import ToolNode
 from rich.console import Console
 from rich.table import Table
 from rich.panel import Panel
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from utils.json_stream import StreamingJSONExtractor
 
 console = Console()
 
@@ -50,52 +49,16 @@ def error_handler(func: Callable[P, R]) -> Callable[P, R]:
 
 @error_handler
 def extract_json_from_string(llm_output: str) -> Optional[dict]:
-    # print('***', llm_output, '***')
-    def parse_json_candidate(json_str: str) -> Optional[dict]:
-        try:
-            return json.loads(json_str)
-        except json.JSONDecodeError:
-            # Escape unescaped newline characters and try again.
-            cleaned = re.sub(r'(?<!\\)\n', '\\n', json_str)
-            try:
-                return json.loads(cleaned)
-            except json.JSONDecodeError:
-                return None
-    try:
-        llm_output = llm_output.strip()
-
-        # If the entire string is a JSON object.
-        if llm_output.startswith('{') and llm_output.endswith('}'):
-            result = parse_json_candidate(llm_output)
-            if result is not None:
-                return result
-
-        # Look for JSON following a </think> tag.
-        match = re.search(r'</think>\s*(\{.*\})', llm_output, re.DOTALL)
-        if match:
-            json_str = match.group(1).strip()
-            result = parse_json_candidate(json_str)
-            if result is not None:
-                return result
-
-        # Look for JSON inside triple backticks.
-        match = re.search(r'```json(.*?)```', llm_output, re.DOTALL)
-        if match:
-            json_str = match.group(1).strip()
-            result = parse_json_candidate(json_str)
-            if result is not None:
-                return result
-
-        # Look for a JSON object anywhere in the string as a fallback.
-        match = re.search(r'(\{.*\})', llm_output, re.DOTALL)
-        if match:
-            json_str = match.group(1).strip()
-            result = parse_json_candidate(json_str)
-            if result is not None:
-                return result
-
-        raise ValueError("No valid JSON found in the input string.")
+    """Extract the first JSON object from a complete LLM response.
 
+    Skips `<think>` blocks and code fences and tolerates trailing commas and raw
+    newlines in strings. Use StreamingJSONExtractor directly for partial output.
+    """
+    try:
+        result = StreamingJSONExtractor.extract(llm_output)
+        if result is None:
+            raise ValueError("No valid JSON found in the input string.")
+        return result
     except Exception as e:
         return None
 
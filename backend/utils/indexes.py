@@ -0,0 +1,66 @@
+from typing import List, NamedTuple, Optional, Sequence, Tuple, Type
+from beanie import Document
+from models.analysis_cache import CachedAnalysis
+from models.journal import Journal, UserStreak
+from models.task import Task
+import logging
+
+logger = logging.getLogger(__name__)
+
+class QueryShape(NamedTuple):
+    """A query the API runs on a hot path: equality-filtered fields plus a sort"""
+    model: Type[Document]
+    name: str
+    filter: Tuple[str, ...] = ()
+    sort: Tuple[Tuple[str, int], ...] = ()
+
+# Keep in sync with the find/update filters used by the API handlers and TaskManager
+HOT_QUERY_SHAPES: List[QueryShape] = [
+    QueryShape(Journal, "journal by id", filter=("journal_id",)),
+    QueryShape(Journal, "journal by idempotency key", filter=("idempotency_key",)),
+    QueryShape(Journal, "journal history", sort=(("created_at", -1), ("journal_id", -1))),
+    QueryShape(Journal, "user journal history", filter=("user_id",), sort=(("created_at", -1),)),
+    QueryShape(UserStreak, "streak by user", filter=("user_id",)),
+    QueryShape(Task, "task by id", filter=("task_id",)),
+    QueryShape(Task, "claim pending job", filter=("status",), sort=(("available_at", 1),)),
+    QueryShape(Task, "reclaim expired job", filter=("status",), sort=(("lease_expires_at", 1),)),
+    QueryShape(CachedAnalysis, "cached analysis by key", filter=("key",)),
+]
+
+def index_covers(index_key: Sequence[Tuple[str, int]], shape: QueryShape) -> bool:
+    """Whether an index can answer the shape's equality filter and sort without a scan or in-memory sort"""
+    fields = [field for field, _ in index_key]
+    directions = [direction for _, direction in index_key]
+    equality_count = len(shape.filter)
+
+    if len(fields) < equality_count + len(shape.sort):
+        return False
+    # Equality fields may appear in any order, but must form the index prefix
+    if set(fields[:equality_count]) != set(shape.filter):
+        return False
+
+    sort_fields = fields[equality_count:equality_count + len(shape.sort)]
+    sort_directions = directions[equality_count:equality_count + len(shape.sort)]
+    if sort_fields != [field for field, _ in shape.sort]:
+        return False
+    # An index can be walked forwards or backwards, but not mixed
+    wanted = [direction for _, direction in shape.sort]
+    return sort_directions == wanted or sort_directions == [-direction for direction in wanted]
+
+async def find_uncovered_queries(shapes: Optional[List[QueryShape]] = None) -> List[QueryShape]:
+    """Check each hot query shape against the indexes that exist in MongoDB and log the uncovered ones"""
+    uncovered = []
+    index_keys = {}
+    for shape in shapes or HOT_QUERY_SHAPES:
+        collection = shape.model.get_motor_collection()
+        if collection.name not in index_keys:
+            information = await collection.index_information()
+            index_keys[collection.name] = [index["key"] for index in information.values()]
+
+        if not any(index_covers(key, shape) for key in index_keys[collection.name]):
+            uncovered.append(shape)
+            logger.warning(
+                f"Query '{shape.name}' on '{collection.name}' is not covered by an index "
+                f"(filter={list(shape.filter)}, sort={list(shape.sort)})"
+            )
+    return uncovered
@@ -0,0 +1,192 @@
+"""
+Durable job queue on top of the `Task` collection.
+
+Jobs are Task documents with a `kind` and a `payload`. A JobWorkerPool claims
+pending jobs atomically (see TaskManager.claim_task), runs the registered handler
+for their kind with bounded concurrency and writes the result back. Claimed jobs
+carry a lease that the worker keeps renewing; if a worker dies, its lease expires
+and another worker reclaims the job, so queued work survives restarts.
+"""
+import asyncio
+import logging
+import os
+import socket
+import traceback
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from models.task import Task, TaskStatus
+from utils.task_manager import TaskManager
+
+logger = logging.getLogger(__name__)
+
+ProgressCallback = Callable[[int, int], Awaitable[None]]
+JobHandler = Callable[[Dict[str, Any], ProgressCallback], Awaitable[Dict[str, Any]]]
+
+
+class RetryJob(Exception):
+    """Raised by a handler to put its job back in the queue without counting the attempt."""
+
+    def __init__(self, message: str, delay_seconds: float):
+        super().__init__(message)
+        self.delay_seconds = delay_seconds
+
+
+_handlers: Dict[str, JobHandler] = {}
+_active_pool: Optional["JobWorkerPool"] = None
+
+
+def job_handler(kind: str) -> Callable[[JobHandler], JobHandler]:
+    """Register the coroutine that runs jobs of `kind`: handler(payload, progress) -> result."""
+    def register(func: JobHandler) -> JobHandler:
+        _handlers[kind] = func
+        return func
+    return register
+
+
+async def enqueue_job(kind: str, payload: Dict[str, Any]) -> Task:
+    """Store a job for the worker pool and return its task."""
+    if kind not in _handlers:
+        raise ValueError(f"No job handler registered for '{kind}'")
+    task = await TaskManager.enqueue_task(kind, payload)
+    # Wake a local worker straight away instead of waiting for the next poll
+    if _active_pool is not None:
+        _active_pool.notify()
+    return task
+
+
+class JobWorkerPool:
+    """Claim and run queued jobs with a fixed number of concurrent workers."""
+
+    def __init__(
+        self,
+        concurrency: int,
+        lease_seconds: float,
+        poll_interval: float,
+        max_attempts: int,
+        retry_delay_seconds: float = 5.0
+    ):
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_delay_seconds = retry_delay_seconds
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._workers: List["asyncio.Task[None]"] = []
+        self._wakeup = asyncio.Event()
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+
+    def notify(self) -> None:
+        """Tell idle workers that a job may be waiting."""
+        self._wakeup.set()
+
+    async def start(self) -> None:
+        """Start the workers and make this the pool that enqueue_job wakes up."""
+        global _active_pool
+        _active_pool = self
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+        logger.info(f"Started {self.concurrency} job workers as {self.worker_id}")
+
+    async def stop(self) -> None:
+        """Stop the workers and hand their unfinished jobs back to the queue."""
+        global _active_pool
+        if _active_pool is self:
+            _active_pool = None
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        released = await TaskManager.release_tasks(self.worker_id)
+        if released:
+            logger.info(f"Released {released} unfinished jobs back to the queue")
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for the pool."""
+        return {
+            "worker_id": self.worker_id,
+            "concurrency": self.concurrency,
+            "workers_alive": sum(not worker.done() for worker in self._workers),
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "retried": self.retried,
+        }
+
+    async def _work(self) -> None:
+        while True:
+            try:
+                task = await TaskManager.claim_task(list(_handlers), self.worker_id, self.lease_seconds)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Failed to claim a job: {e}")
+                task = None
+
+            if task is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self.running += 1
+            try:
+                await self._run(task)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Recording the outcome failed (e.g. Mongo unreachable); the lease runs out and
+                # the job is claimed again, but this worker must keep serving the queue
+                logger.error(f"Failed to record the outcome of job {task.task_id}: {e}")
+            finally:
+                self.running -= 1
+
+    async def _run(self, task: Task) -> None:
+        if task.attempts > self.max_attempts:
+            self.failed += 1
+            await TaskManager.transition_task(
+                task.task_id, TaskStatus.FAILED, worker_id=self.worker_id, lease_expires_at=None,
+                error=f"Gave up after {self.max_attempts} attempts: {task.error}"
+            )
+            return
+
+        heartbeat = asyncio.create_task(self._renew_lease(task.task_id))
+        try:
+            result = await _handlers[task.kind](task.payload or {}, TaskManager.progress_reporter(task.task_id, worker_id=self.worker_id))
+        except RetryJob as e:
+            self.retried += 1
+            await TaskManager.requeue_task(task.task_id, self.worker_id, e.delay_seconds, str(e), count_attempt=False)
+        except Exception as e:
+            logger.error(f"Job {task.task_id} ({task.kind}) failed: {e}\n{traceback.format_exc()}")
+            if task.attempts < self.max_attempts:
+                self.retried += 1
+                # Back off linearly with the number of attempts already made
+                await TaskManager.requeue_task(task.task_id, self.worker_id, self.retry_delay_seconds * task.attempts, str(e))
+            else:
+                self.failed += 1
+                await TaskManager.transition_task(
+                    task.task_id, TaskStatus.FAILED, worker_id=self.worker_id, lease_expires_at=None, error=str(e)
+                )
+        else:
+            self.completed += 1
+            await TaskManager.transition_task(
+                task.task_id, TaskStatus.COMPLETED, worker_id=self.worker_id, lease_expires_at=None,
+                result=result, progress=1.0, error=None
+            )
+        finally:
+            heartbeat.cancel()
+
+    async def _renew_lease(self, task_id: str) -> None:
+        """Keep the lease alive while the handler runs; a third of the lease leaves room for slow writes."""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                if not await TaskManager.renew_lease(task_id, self.worker_id, self.lease_seconds):
+                    logger.warning(f"Lost the lease on job {task_id}")
+                    return
+            except Exception as e:
+                logger.warning(f"Failed to renew the lease on job {task_id}: {e}")
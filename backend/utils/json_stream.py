@@ -0,0 +1,289 @@
+"""Incremental extraction of a JSON object from streamed LLM output."""
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# (key, index, value): index is None when a top-level field of the object has
+# closed, or the position of an element that closed inside a top-level array.
+JSONStreamEvent = Tuple[str, Optional[int], Any]
+
+_WHITESPACE = re.compile(r'\s*')
+# Complete characters and escapes of a string body; stops at the closing quote,
+# or at the end of the input (possibly before a lone trailing backslash)
+_STRING_BODY = re.compile(r'(?:[^"\\]|\\.)*', re.DOTALL)
+_SCALAR = re.compile(r'[^\s{}\[\],:"]*')
+_OUTSIDE_MARKER = re.compile(r'[{<]')
+_UNESCAPED_NEWLINE = re.compile(r'(?<!\\)\n')
+_TRAILING_COMMA = re.compile(r',\s*([\]}])')
+
+_DECODER = json.JSONDecoder()
+
+_THINK_OPEN = "<think>"
+_THINK_CLOSE = "</think>"
+
+
+class _InvalidJSON(Exception):
+    """Raised when the candidate object turns out not to be JSON."""
+
+
+class _Frame:
+    """An open object or array."""
+    __slots__ = ("kind", "start", "state", "key", "count", "items")
+
+    def __init__(self, kind: str, start: int):
+        self.kind = kind
+        self.start = start
+        # Objects move through key -> colon -> value -> comma, arrays through value -> comma
+        self.state = "key" if kind == "{" else "value"
+        self.key: Optional[str] = None
+        self.count = 0
+        self.items: List[Any] = []
+
+
+class StreamingJSONExtractor:
+    """Extract the first JSON object from LLM output as it arrives in chunks.
+
+    Text outside the object is skipped, including `<think>...</think>` blocks and
+    code fence markers. Brace depth, string state and the position reached inside
+    an unfinished string or scalar are carried across chunks, so a well-formed
+    object is tokenised in one pass however it is split. Top-level fields are
+    reported as soon as their value closes, and so is every element of a top-level
+    array (for example each entry of `questions`).
+
+    Trailing commas and raw newlines inside strings are tolerated, since models
+    produce both. If a brace turns out not to start valid JSON, scanning resumes
+    right after it, so the text of an abandoned candidate is scanned again; events
+    already returned for that candidate are not retracted.
+
+    Usage:
+        extractor = StreamingJSONExtractor()
+        for chunk in chunks:
+            for key, index, value in extractor.feed(chunk):
+                ...
+        extractor.finish()
+        extractor.result  # the parsed object, or None
+    """
+
+    def __init__(self):
+        self._buf = ""
+        self._pos = 0
+        self._final = False
+        self._think_search_from: Optional[int] = None
+        self._root_start: Optional[int] = None
+        self._stack: List[_Frame] = []
+        self._fields: Dict[str, Any] = {}
+        # Where scanning of a string or scalar cut off by the end of a chunk resumes
+        self._partial: Optional[int] = None
+        self.result: Optional[Dict[str, Any]] = None
+
+    @property
+    def done(self) -> bool:
+        """Whether a complete object has been extracted."""
+        return self.result is not None
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far."""
+        return self._buf
+
+    def feed(self, chunk: str) -> List[JSONStreamEvent]:
+        """Add a chunk of output and return the fields and array elements it completed."""
+        self._buf += chunk
+        return self._process()
+
+    @classmethod
+    def extract(cls, text: str) -> Optional[Dict[str, Any]]:
+        """Extract the first JSON object from a complete string."""
+        extractor = cls()
+        extractor._final = True
+        extractor.feed(text)
+        return extractor.result
+
+    def finish(self) -> List[JSONStreamEvent]:
+        """Signal the end of the output, flushing a trailing scalar value if any."""
+        self._final = True
+        return self._process()
+
+    def _process(self) -> List[JSONStreamEvent]:
+        events: List[JSONStreamEvent] = []
+        while self.result is None:
+            if self._root_start is None:
+                if not self._scan_outside():
+                    break
+                continue
+            try:
+                if not self._scan_token(events):
+                    break
+            except _InvalidJSON:
+                # Not an object after all: look for the next candidate after this brace
+                self._pos = self._root_start + 1
+                self._root_start = None
+                self._stack = []
+                self._fields = {}
+                self._partial = None
+        return events
+
+    def _scan_outside(self) -> bool:
+        """Advance to the next `{` outside think blocks. Returns False when more input is needed."""
+        buf = self._buf
+
+        if self._think_search_from is not None:
+            end = buf.find(_THINK_CLOSE, self._think_search_from)
+            if end < 0:
+                self._think_search_from = max(self._think_search_from, len(buf) - len(_THINK_CLOSE) + 1)
+                return False
+            self._pos = end + len(_THINK_CLOSE)
+            self._think_search_from = None
+            return True
+
+        match = _OUTSIDE_MARKER.search(buf, self._pos)
+        if not match:
+            self._pos = len(buf)
+            return False
+
+        self._pos = match.start()
+        if match.group() == "{":
+            if self._final and self._decode_complete(self._pos):
+                return True
+            self._root_start = self._pos
+            self._stack = [_Frame("{", self._pos)]
+            self._fields = {}
+            self._pos += 1
+            return True
+
+        # A "<" may open a think block, possibly split across chunks
+        if buf.startswith(_THINK_OPEN, self._pos):
+            self._think_search_from = self._pos + len(_THINK_OPEN)
+            return True
+        if _THINK_OPEN.startswith(buf[self._pos:]) and not self._final:
+            return False
+        self._pos += 1
+        return True
+
+    def _decode_complete(self, start: int) -> bool:
+        """With all input present, try the C decoder on the whole candidate object first."""
+        try:
+            value, _ = _DECODER.raw_decode(self._buf, start)
+        except json.JSONDecodeError:
+            return False
+        if not isinstance(value, dict):
+            return False
+        self.result = value
+        return True
+
+    def _scan_token(self, events: List[JSONStreamEvent]) -> bool:
+        """Consume one token inside the object. Returns False when more input is needed."""
+        buf = self._buf
+        pos = _WHITESPACE.match(buf, self._pos).end()
+        self._pos = pos
+        if pos >= len(buf):
+            if self._final:
+                raise _InvalidJSON()
+            return False
+
+        char = buf[pos]
+        frame = self._stack[-1]
+
+        if char == '"':
+            end = _STRING_BODY.match(buf, pos + 1 if self._partial is None else self._partial).end()
+            if end >= len(buf) or buf[end] != '"':
+                # Unterminated so far; only the part after `end` is examined next time
+                if self._final:
+                    raise _InvalidJSON()
+                self._partial = end
+                return False
+            self._partial = None
+            end += 1
+            if frame.kind == "{" and frame.state == "key":
+                # Only keys of the root object are ever reported
+                frame.key = self._decode(pos, end) if len(self._stack) == 1 else None
+                frame.state = "colon"
+            else:
+                self._expect_value(frame)
+                self._on_value(frame, pos, end, events)
+            self._pos = end
+            return True
+
+        if char in "{[":
+            self._expect_value(frame)
+            self._stack.append(_Frame(char, pos))
+            self._pos = pos + 1
+            return True
+
+        if char in "}]":
+            if frame.kind != ("{" if char == "}" else "["):
+                raise _InvalidJSON()
+            # Closing straight after a comma is a trailing comma, which is tolerated
+            if frame.state not in ("comma", "key" if char == "}" else "value"):
+                raise _InvalidJSON()
+            self._pos = pos + 1
+            self._stack.pop()
+            if not self._stack:
+                self.result = self._fields
+            else:
+                self._on_value(self._stack[-1], frame.start, pos + 1, events, frame)
+            return True
+
+        if char == ":":
+            if frame.kind != "{" or frame.state != "colon":
+                raise _InvalidJSON()
+            frame.state = "value"
+            self._pos = pos + 1
+            return True
+
+        if char == ",":
+            if frame.state != "comma":
+                raise _InvalidJSON()
+            frame.state = "key" if frame.kind == "{" else "value"
+            self._pos = pos + 1
+            return True
+
+        end = _SCALAR.match(buf, pos if self._partial is None else self._partial).end()
+        if end >= len(buf) and not self._final:
+            # The number or literal may continue in the next chunk
+            self._partial = end
+            return False
+        self._partial = None
+        self._expect_value(frame)
+        self._on_value(frame, pos, end, events)
+        self._pos = end
+        return True
+
+    @staticmethod
+    def _expect_value(frame: _Frame) -> None:
+        if frame.state != "value":
+            raise _InvalidJSON()
+
+    def _on_value(self, frame: _Frame, start: int, end: int, events: List[JSONStreamEvent],
+                  closed: Optional[_Frame] = None) -> None:
+        """Record a value that just closed inside `frame`."""
+        frame.state = "comma"
+        depth = len(self._stack)
+
+        if depth == 1:
+            # A member of the root object
+            value = self._decode(start, end, closed)
+            self._fields[frame.key] = value
+            events.append((frame.key, None, value))
+        elif depth == 2 and frame.kind == "[":
+            # An element of an array held directly by the root object
+            value = self._decode(start, end, closed)
+            frame.items.append(value)
+            events.append((self._stack[0].key, frame.count, value))
+        frame.count += 1
+
+    def _decode(self, start: int, end: int, closed: Optional[_Frame] = None) -> Any:
+        """Parse one value, retrying with the usual LLM output repairs."""
+        if closed is not None and closed.kind == "[" and len(self._stack) == 1:
+            # Root-level arrays were already collected element by element
+            return closed.items
+        raw = self._buf[start:end]
+        try:
+            return json.loads(raw)
+        except json.JSONDecodeError:
+            pass
+        cleaned = _TRAILING_COMMA.sub(r'\1', _UNESCAPED_NEWLINE.sub('\\\\n', raw))
+        try:
+            return json.loads(cleaned)
+        except json.JSONDecodeError:
+            raise _InvalidJSON()
@@ -0,0 +1,39 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Generic, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight(Generic[T]):
+    """Coalesce concurrent calls that share a key into a single execution.
+
+    The first caller for a key starts the work; callers that arrive while it is
+    still running await the same task and receive the same result or exception.
+    The key is released as soon as the work finishes, so later calls run again.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, "asyncio.Task[T]"] = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: str, func: Callable[[], Awaitable[T]]) -> T:
+        """Run `func` for `key`, or join the run already in flight."""
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.shared += 1
+        # Shield so one caller disconnecting does not cancel the work for the others
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for how often work was shared."""
+        return {
+            "in_flight": len(self._inflight),
+            "calls": self.calls,
+            "shared": self.shared,
+        }
@@ -1,11 +1,22 @@
-from typing import Dict, Any, Optional, Callable, Awaitable
-from models.task import Task, TaskStatus
+from typing import Dict, Any, Optional, Callable, Awaitable, Iterable, List
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from models.task import Task, TaskProgress, TaskStatus
 import asyncio
+import time
 import traceback
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Allowed previous statuses for each target status
+ALLOWED_PREVIOUS_STATUSES = {
+    TaskStatus.PENDING: (TaskStatus.RUNNING,),
+    TaskStatus.RUNNING: (TaskStatus.PENDING,),
+    TaskStatus.COMPLETED: (TaskStatus.RUNNING,),
+    TaskStatus.FAILED: (TaskStatus.PENDING, TaskStatus.RUNNING),
+}
+
 class TaskManager:
     @staticmethod
     async def create_task() -> Task:
@@ -19,37 +30,186 @@ class TaskManager:
         """Get a task by its ID"""
         return await Task.find_one({"task_id": task_id})
     
+    @staticmethod
+    async def get_task_progress(task_id: str) -> Optional[TaskProgress]:
+        """Get only the status and progress of a task, without loading its result"""
+        return await Task.find_one({"task_id": task_id}).project(TaskProgress)
+    
+    @staticmethod
+    async def transition_task(
+        task_id: str,
+        status: TaskStatus,
+        expected: Optional[Iterable[TaskStatus]] = None,
+        worker_id: Optional[str] = None,
+        **fields: Any
+    ) -> Optional[Task]:
+        """
+        Move a task to a new status in one conditional update.
+
+        The update only applies while the task is in one of the expected previous
+        statuses (by default those allowed by ALLOWED_PREVIOUS_STATUSES), so racing
+        or repeated transitions are rejected by MongoDB instead of overwriting each other.
+        Passing `worker_id` additionally requires the task to be held by that worker.
+
+        Returns:
+            The updated task, or None if it doesn't exist or was not in an expected status
+        """
+        expected = ALLOWED_PREVIOUS_STATUSES[status] if expected is None else tuple(expected)
+        query = {"task_id": task_id, "status": {"$in": [previous.value for previous in expected]}}
+        if worker_id is not None:
+            query["worker_id"] = worker_id
+        document = await Task.get_motor_collection().find_one_and_update(
+            query,
+            {"$set": {"status": status.value, "updated_at": datetime.utcnow(), **fields}},
+            return_document=ReturnDocument.AFTER
+        )
+        if document is None:
+            logger.warning(f"Task {task_id} could not move to {status.value}: not in {[s.value for s in expected]}")
+            return None
+        return Task.model_validate(document)
+    
     @staticmethod
     async def update_task_status(task_id: str, status: TaskStatus) -> Optional[Task]:
         """Update the status of a task"""
-        task = await TaskManager.get_task(task_id)
-        if task:
-            task.status = status
-            await task.save()
-        return task
+        return await TaskManager.transition_task(task_id, status)
     
     @staticmethod
     async def update_task_result(task_id: str, result: Dict[str, Any], agent_run_id: Optional[str] = None) -> Optional[Task]:
         """Update the result of a task"""
-        task = await TaskManager.get_task(task_id)
-        if task:
-            task.status = TaskStatus.COMPLETED
-            task.result = result
-            if agent_run_id:
-                task.agent_run_id = agent_run_id
-            await task.save()
-        return task
+        fields = {"result": result, "progress": 1.0}
+        if agent_run_id:
+            fields["agent_run_id"] = agent_run_id
+        return await TaskManager.transition_task(task_id, TaskStatus.COMPLETED, **fields)
     
     @staticmethod
     async def update_task_error(task_id: str, error: str) -> Optional[Task]:
         """Update the error of a task"""
-        task = await TaskManager.get_task(task_id)
-        if task:
-            task.status = TaskStatus.FAILED
-            task.error = error
-            await task.save()
+        return await TaskManager.transition_task(task_id, TaskStatus.FAILED, error=error)
+    
+    @staticmethod
+    async def update_task_progress(task_id: str, progress: float, worker_id: Optional[str] = None) -> bool:
+        """
+        Record the progress of a running task without reading it back
+
+        Passing `worker_id` requires the task to still be held by that worker, so a worker
+        whose lease was taken over can't overwrite the new owner's progress.
+        """
+        query = {"task_id": task_id, "status": TaskStatus.RUNNING.value}
+        if worker_id is not None:
+            query["worker_id"] = worker_id
+        result = await Task.get_motor_collection().update_one(
+            query,
+            {"$set": {"progress": min(max(progress, 0.0), 1.0), "updated_at": datetime.utcnow()}}
+        )
+        return result.modified_count == 1
+    
+    @staticmethod
+    def progress_reporter(task_id: str, min_interval: float = 1.0,
+                          worker_id: Optional[str] = None) -> Callable[[int, int], Awaitable[None]]:
+        """
+        Build a `report(done, total)` callback for long jobs.
+
+        Writes are throttled to one per `min_interval` seconds (plus the final one),
+        so reporting after every item stays cheap.
+        """
+        last_write = 0.0
+        
+        async def report(done: int, total: int) -> None:
+            nonlocal last_write
+            now = time.monotonic()
+            if done < total and now - last_write < min_interval:
+                return
+            last_write = now
+            await TaskManager.update_task_progress(task_id, done / total if total else 1.0, worker_id)
+        
+        return report
+    
+    @staticmethod
+    async def enqueue_task(kind: str, payload: Dict[str, Any]) -> Task:
+        """Create a pending job for the worker pool"""
+        task = Task(kind=kind, payload=payload, available_at=datetime.utcnow())
+        await task.insert()
         return task
     
+    @staticmethod
+    async def claim_task(kinds: List[str], worker_id: str, lease_seconds: float) -> Optional[Task]:
+        """
+        Atomically claim the oldest due job, or a running one whose worker stopped renewing its lease.
+
+        The claim sets RUNNING, the worker and a lease deadline and counts the attempt in
+        the same update, so two workers can never claim the same job.
+        """
+        now = datetime.utcnow()
+        document = await Task.get_motor_collection().find_one_and_update(
+            {
+                "kind": {"$in": kinds},
+                "$or": [
+                    {"status": TaskStatus.PENDING.value, "available_at": {"$lte": now}},
+                    {"status": TaskStatus.RUNNING.value, "lease_expires_at": {"$lt": now}},
+                ]
+            },
+            {
+                "$set": {
+                    "status": TaskStatus.RUNNING.value,
+                    "worker_id": worker_id,
+                    "lease_expires_at": now + timedelta(seconds=lease_seconds),
+                    "updated_at": now
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("available_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+        return Task.model_validate(document) if document else None
+    
+    @staticmethod
+    async def renew_lease(task_id: str, worker_id: str, lease_seconds: float) -> bool:
+        """Extend the lease of a job this worker still holds"""
+        result = await Task.get_motor_collection().update_one(
+            {"task_id": task_id, "worker_id": worker_id, "status": TaskStatus.RUNNING.value},
+            {"$set": {"lease_expires_at": datetime.utcnow() + timedelta(seconds=lease_seconds)}}
+        )
+        return result.modified_count == 1
+    
+    @staticmethod
+    async def requeue_task(task_id: str, worker_id: str, delay_seconds: float = 0, error: Optional[str] = None,
+                           count_attempt: bool = True) -> Optional[Task]:
+        """Put a job this worker holds back in the queue, to be claimed again after `delay_seconds`"""
+        document = await Task.get_motor_collection().find_one_and_update(
+            {"task_id": task_id, "worker_id": worker_id, "status": TaskStatus.RUNNING.value},
+            {
+                "$set": {
+                    "status": TaskStatus.PENDING.value,
+                    "available_at": datetime.utcnow() + timedelta(seconds=delay_seconds),
+                    "worker_id": None,
+                    "lease_expires_at": None,
+                    "error": error,
+                    "updated_at": datetime.utcnow()
+                },
+                "$inc": {"attempts": 0 if count_attempt else -1}
+            },
+            return_document=ReturnDocument.AFTER
+        )
+        return Task.model_validate(document) if document else None
+    
+    @staticmethod
+    async def release_tasks(worker_id: str) -> int:
+        """Return every job a stopping worker holds to the queue without counting the attempt"""
+        result = await Task.get_motor_collection().update_many(
+            {"worker_id": worker_id, "status": TaskStatus.RUNNING.value},
+            {
+                "$set": {
+                    "status": TaskStatus.PENDING.value,
+                    "available_at": datetime.utcnow(),
+                    "worker_id": None,
+                    "lease_expires_at": None,
+                    "updated_at": datetime.utcnow()
+                },
+                "$inc": {"attempts": -1}
+            }
+        )
+        return result.modified_count
+    
     @staticmethod
     async def run_background_task(
         task_id: str,
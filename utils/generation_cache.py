@@ -0,0 +1,101 @@
+"""Content-addressed on-disk cache for dataset generation calls."""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Optional
+
+CACHE_FILENAME = "generation_cache.sqlite3"
+
+
+class CacheMissError(Exception):
+    """Raised in replay mode when a prompt has no cached response."""
+
+
+class GenerationCache:
+    """SQLite cache of LLM responses keyed by prompt, model and temperature.
+
+    A key is the SHA-256 of everything that determines the request, so re-running
+    a build with unchanged prompts reads every response from disk. In replay mode
+    the network is never used: a prompt that is not cached raises CacheMissError
+    instead of being sent.
+
+    Usage:
+        cache = GenerationCache(os.path.join(tmp_dir, CACHE_FILENAME))
+        key = cache.key("journal_entry", prompt, llm)
+        value = cache.get(key)
+        if value is None:
+            value = call_the_model()
+            cache.set(key, value)
+    """
+
+    def __init__(self, path: str, replay: bool = False):
+        self.path = path
+        self.replay = replay
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # One connection shared by the event loop and any worker threads, guarded by a lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS generations ("
+            "key TEXT PRIMARY KEY, kind TEXT NOT NULL, model TEXT, temperature REAL, value TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def key(kind: str, prompt: str, llm: Any) -> str:
+        """Cache key for a call.
+
+        Args:
+            kind: Kind of call, e.g. "journal_entry"; keeps structured and plain outputs apart.
+            prompt: Prompt text sent to the model.
+            llm: Client the call is made with; its model name and temperature are part of the key.
+
+        Returns:
+            Hex digest identifying the call.
+        """
+        identity = {
+            "kind": kind,
+            "prompt": prompt,
+            "model": getattr(llm, "model_name", None),
+            "temperature": getattr(llm, "temperature", None),
+        }
+        return hashlib.sha256(json.dumps(identity, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Cached value for a key, or None. In replay mode a miss raises CacheMissError."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM generations WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            self.hits += 1
+            return json.loads(row[0])
+        self.misses += 1
+        if self.replay:
+            raise CacheMissError(f"No cached response for {key[:12]} in replay mode")
+        return None
+
+    def set(self, key: str, value: Any, kind: str = "", llm: Any = None) -> None:
+        """Store a response."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO generations (key, kind, model, temperature, value) VALUES (?, ?, ?, ?, ?)",
+                (key, kind, getattr(llm, "model_name", None), getattr(llm, "temperature", None),
+                 json.dumps(value, ensure_ascii=False))
+            )
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit and miss counters for this run."""
+        return {"path": self.path, "replay": self.replay, "hits": self.hits, "misses": self.misses}
+
+    def close(self) -> None:
+        """Close the database."""
+        with self._lock:
+            self._conn.close()
+        logging.info(f"Generation cache: {self.hits} hits, {self.misses} misses ({self.path})")
@@ -7,6 +7,21 @@ import random
 import time
 from typing import List, Dict, Any, Optional
 
+# Text used when generation fails; the dedup stage flags rows that contain it
+FALLBACK_QUESTIONS = [
+    "How did this experience make you feel?",
+    "What thoughts came up for you during this moment?",
+    "How does this connect to your broader life patterns?",
+    "What might this experience be teaching you?",
+    "How might you approach similar situations in the future?"
+]
+
+FALLBACK_ENTRY_SUFFIX = "It was a significant moment in my life that made me reflect on my journey."
+
+def fallback_entry(life_event: str) -> str:
+    """Journal entry used when generation fails."""
+    return f"Today I experienced {life_event}. {FALLBACK_ENTRY_SUFFIX}"
+
 def unique_id(text: str) -> str:
     """Generate a unique identifier for a text string."""
     return hashlib.sha1(text.encode()).hexdigest()
@@ -33,3 +48,92 @@ def load_life_events(file_path: str) -> List[str]:
     except Exception as e:
         logging.error(f"Error loading life events: {e}")
         return []
+
+def load_completed_ids(file_path: str, id_field: str = "event_id") -> set:
+    """Collect the ids of rows already written to a JSONL file, repairing a torn last line.
+    
+    A line without its trailing newline was cut off by a crash mid-write, so it is
+    truncated away before the file is appended to again.
+    
+    Args:
+        file_path: Path to the JSONL file.
+        id_field: Row field holding the id.
+        
+    Returns:
+        Set of ids found in the file.
+    """
+    completed = set()
+    if not os.path.exists(file_path):
+        return completed
+
+    with open(file_path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            logging.warning(f"Dropping a torn last line ({len(data) - end} bytes) from {file_path}")
+            f.truncate(end)
+
+    for line_number, line in enumerate(data[:end].splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError:
+            logging.warning(f"Skipping unreadable line {line_number} in {file_path}")
+            continue
+        if row.get(id_field):
+            completed.add(row[id_field])
+    return completed
+
+class JsonlAppender:
+    """Append JSON rows to a file one whole line at a time, with batched fsync.
+    
+    Each row is written with a single write() on a file opened with O_APPEND, so
+    a line is never interleaved or split by Python-level buffering. Calling fsync
+    after every line would serialise the build on the disk; instead it runs every
+    `fsync_every` rows, every `fsync_interval` seconds and on close. A crash can
+    then lose at most the last unsynced rows or leave one torn last line, which
+    load_completed_ids removes on resume.
+    """
+
+    def __init__(self, file_path: str, fsync_every: int = 20, fsync_interval: float = 5.0):
+        self.file_path = file_path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self._fd = os.open(file_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def write(self, row: Dict[str, Any]) -> None:
+        """Append one row as a single line."""
+        data = (json.dumps(row, ensure_ascii=False) + "\n").encode("utf-8")
+        written = os.write(self._fd, data)
+        while written < len(data):
+            # Short writes are rare for regular files, but finish the line if one happens
+            written += os.write(self._fd, data[written:])
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+            self.sync()
+
+    def sync(self) -> None:
+        """Flush written rows to disk."""
+        if self._unsynced:
+            os.fsync(self._fd)
+            self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def close(self) -> None:
+        """Sync and close the file."""
+        if self._fd is None:
+            return
+        try:
+            self.sync()
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self) -> "JsonlAppender":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
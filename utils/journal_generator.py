@@ -1,16 +1,40 @@
 """Journal entry and questions generator module."""
+import asyncio
 import logging
+import os
 import time
-from typing import List, Dict, Any, Optional, Tuple
+from contextlib import asynccontextmanager
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator, Awaitable, Callable
 import random
-from concurrent.futures import ThreadPoolExecutor
 
 from langchain_openai import ChatOpenAI
 from langchain.schema import HumanMessage, SystemMessage
 from langchain.prompts import ChatPromptTemplate
 from pydantic import BaseModel, Field
 
-from utils.helpers import unique_id
+from utils.helpers import unique_id, FALLBACK_QUESTIONS, fallback_entry
+from utils.generation_cache import CacheMissError, GenerationCache
+
+# Number of events generated at the same time; each event makes two API calls.
+# The limit adapts between 1 and DATASET_MAX_CONCURRENCY as rate limits and latency allow.
+DEFAULT_CONCURRENCY = int(os.getenv("DATASET_CONCURRENCY", "16"))
+MAX_CONCURRENCY = int(os.getenv("DATASET_MAX_CONCURRENCY", "64"))
+
+# Retries for rate-limited and transient failures before an event falls back
+MAX_RETRIES = int(os.getenv("DATASET_MAX_RETRIES", "6"))
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 60.0
+
+# "two_call" generates the entry, then its questions; "fused" asks for both in one structured call
+TWO_CALL_MODE = "two_call"
+FUSED_MODE = "fused"
+DEFAULT_GENERATION_MODE = os.getenv("DATASET_GENERATION_MODE", TWO_CALL_MODE)
+
+MODEL_NAME = "gpt-4o-mini"
+DEFAULT_TEMPERATURE = 0.8
+
+TRANSIENT_STATUS_CODES = {408, 409, 500, 502, 503, 504}
+TRANSIENT_ERROR_NAMES = {"APIConnectionError", "APITimeoutError", "InternalServerError", "ServiceUnavailableError"}
 
 class JournalingQuestions(BaseModel):
     """Model for journaling follow-up questions."""
@@ -18,63 +42,82 @@ class JournalingQuestions(BaseModel):
         description="A list of max 5 insightful journaling questions that prompt deeper reflection",
     )
 
-def create_llm(temperature: float = 0.8):
+class JournalEntryWithQuestions(BaseModel):
+    """Model for a journal entry and its follow-up questions generated in one call."""
+    entry: str = Field(
+        description="A first-person journal entry of 1-2 short sentences about the life event",
+    )
+    questions: List[str] = Field(
+        description="Exactly 5 insightful journaling questions that prompt deeper reflection on the entry",
+    )
+
+def create_llm(temperature: float = DEFAULT_TEMPERATURE, max_retries: int = 2):
     """Create a ChatOpenAI instance.
-    
+
     Args:
         temperature: Temperature parameter for the LLM.
-        
+        max_retries: Retries done inside the client; 0 when the caller handles backoff itself.
+
     Returns:
         ChatOpenAI instance.
     """
     try:
-        llm = ChatOpenAI(model_name="gpt-4o-mini", temperature=temperature)
+        llm = ChatOpenAI(model_name=MODEL_NAME, temperature=temperature, max_retries=max_retries)
         return llm
     except Exception as e:
         logging.error(f"Error initializing ChatOpenAI: {e}")
         raise
 
-def generate_journal_entry_from_event(life_event: str) -> str:
-    """Generate a journal entry based on a life event.
-    
-    Args:
-        life_event: Description of a life event.
-        
-    Returns:
-        Generated journal entry.
+class CacheOnlyClient:
+    """Stand-in for ChatOpenAI in replay mode.
+
+    It carries the model name and temperature that key the cache, so replayed
+    prompts find the responses recorded with a real client, but it needs no API
+    key and never reaches the network: calling it raises CacheMissError.
     """
-    prompt = (
+
+    def __init__(self, model_name: str = MODEL_NAME, temperature: float = DEFAULT_TEMPERATURE):
+        self.model_name = model_name
+        self.temperature = temperature
+
+    def with_structured_output(self, schema: Any) -> "CacheOnlyClient":
+        return self
+
+    def invoke(self, *args: Any, **kwargs: Any) -> Any:
+        raise CacheMissError("Replay mode never calls the model")
+
+    async def ainvoke(self, *args: Any, **kwargs: Any) -> Any:
+        raise CacheMissError("Replay mode never calls the model")
+
+def create_client_for(cache: Optional[GenerationCache]):
+    """Create a client without client-side retries, or a cache-only stand-in when replaying."""
+    if cache is not None and cache.replay:
+        return CacheOnlyClient()
+    return create_llm(max_retries=0)
+
+def fallback_record(life_event: str, error: Optional[str] = None) -> Dict[str, Any]:
+    """Record used when processing an event fails, marked so it is kept out of the dataset."""
+    record = {
+        "input": fallback_entry(life_event),
+        "output": {"questions": list(FALLBACK_QUESTIONS)},
+        "fallback": True
+    }
+    if error:
+        record["error"] = error
+    return record
+
+def journal_entry_prompt(life_event: str) -> str:
+    """Prompt for generating a journal entry about a life event."""
+    return (
         f"🎯 Generate a unique, authentic, and personal journal entry (1-2 short sentences) about this life event: {life_event}. "
         f"The entry should be in first person, as if someone is writing in their journal about experiencing this event. "
         f"Include specific details and emotions. Make it sound authentic and personal, as a norml averga ehuman would write in their digital journal in a journaling mental health app. "
         f"Avoid quotes or generic language."
     )
-    
-    try:
-        llm = create_llm()
-        response = llm.invoke([HumanMessage(content=prompt)])
-        raw = response.content.strip()
-        entry = raw.rstrip(".")
-        
-        # Add period back if needed for consistency
-        if not entry.endswith("."):
-            entry = entry + "."
-            
-        return entry
-    except Exception as e:
-        logging.error(f"Error generating journal entry: {e}")
-        return f"Today I experienced {life_event}. It was a significant moment in my life that made me reflect on my journey."
 
-def generate_followup_questions(entry: str) -> Dict[str, List[str]]:
-    """Generate follow-up questions for a journal entry.
-    
-    Args:
-        entry: Journal entry text.
-        
-    Returns:
-        Dictionary containing follow-up questions.
-    """
-    prompt = (
+def followup_questions_prompt(entry: str) -> str:
+    """Prompt for generating follow-up questions for a journal entry."""
+    return (
         f"You are a compassionate journaling coach specialized in mental health and personal growth.\n\n"
         f"Given this journal entry:\n\"{entry}\"\n\n"
         f"Generate exactly 5 probing, open-ended follow-up questions that prompts the user to be more expressive and get most out of journaling:\n"
@@ -85,44 +128,166 @@ def generate_followup_questions(entry: str) -> Dict[str, List[str]]:
         f"5. Develop actionable insights\n\n"
         f"Make questions empathetic, non-judgmental, and varied in focus."
     )
-    
-    try:
-        llm = create_llm()
-        llm = llm.with_structured_output(JournalingQuestions)
-        result = llm.invoke(prompt)
-        questions = result.model_dump()
-        
-        logging.info(f"Successfully generated follow-up questions")
-        return questions
-    except Exception as e:
-        logging.error(f"Error generating follow-up questions: {e}")
-        # Return default questions on error
-        return {
-            "questions": [
-                "How did this experience make you feel?",
-                "What thoughts came up for you during this moment?",
-                "How does this connect to your broader life patterns?",
-                "What might this experience be teaching you?",
-                "How might you approach similar situations in the future?"
-            ]
-        }
 
-def process_single_event(event: str) -> Dict[str, Any]:
+def fused_prompt(life_event: str) -> str:
+    """Prompt for generating a journal entry and its follow-up questions in one call."""
+    return (
+        f"You are a compassionate journaling coach specialized in mental health and personal growth.\n\n"
+        f"First, write a unique, authentic, and personal journal entry (1-2 short sentences) about this life event: {life_event}. "
+        f"Write it in first person, as a normal average human would in their digital journal in a journaling mental health app, "
+        f"with specific details and emotions. Avoid quotes or generic language.\n\n"
+        f"Then generate exactly 5 probing, open-ended follow-up questions about that entry that prompt the user to be more expressive and get most out of journaling:\n"
+        f"1. Explore their emotions and feelings more deeply\n"
+        f"2. Identify underlying patterns or triggers\n"
+        f"3. Consider alternative perspectives\n"
+        f"4. Connect with their values and goals\n"
+        f"5. Develop actionable insights\n\n"
+        f"Make questions empathetic, non-judgmental, and varied in focus."
+    )
+
+def clean_journal_entry(raw: str) -> str:
+    """Normalise a generated entry so it ends with exactly one period."""
+    entry = raw.strip().rstrip(".")
+    return entry + "."
+
+def cached_generation(cache: Optional[GenerationCache], kind: str, prompt: str, llm: ChatOpenAI,
+                      generate: Callable[[], Any]) -> Any:
+    """Return the cached response for a call, or generate and store it.
+
+    Args:
+        cache: Generation cache, or None to always call the model.
+        kind: Kind of call, part of the cache key.
+        prompt: Prompt text, part of the cache key.
+        llm: Client whose model and temperature are part of the cache key.
+        generate: Makes the call and returns a JSON-serialisable response.
+
+    Returns:
+        The cached or freshly generated response.
+    """
+    if cache is None:
+        return generate()
+    key = cache.key(kind, prompt, llm)
+    value = cache.get(key)
+    if value is None:
+        value = generate()
+        cache.set(key, value, kind, llm)
+    return value
+
+async def acached_generation(cache: Optional[GenerationCache], kind: str, prompt: str, llm: ChatOpenAI,
+                             generate: Callable[[], Awaitable[Any]]) -> Any:
+    """Async version of cached_generation."""
+    if cache is None:
+        return await generate()
+    key = cache.key(kind, prompt, llm)
+    value = cache.get(key)
+    if value is None:
+        value = await generate()
+        cache.set(key, value, kind, llm)
+    return value
+
+def generate_journal_entry_from_event(life_event: str, llm: Optional[ChatOpenAI] = None,
+                                      cache: Optional[GenerationCache] = None) -> str:
+    """Generate a journal entry based on a life event.
+
+    Rate-limited and transient failures are retried; any other error, or one
+    that outlasts the retries, is raised so the caller can record a fallback.
+
+    Args:
+        life_event: Description of a life event.
+        llm: Client to use; a new one is created if omitted.
+        cache: Generation cache to read from and write to.
+
+    Returns:
+        Generated journal entry.
+    """
+    llm = llm or create_client_for(cache)
+    prompt = journal_entry_prompt(life_event)
+    raw = cached_generation(
+        cache, "journal_entry", prompt, llm,
+        lambda: call_with_retry_sync(lambda: llm.invoke([HumanMessage(content=prompt)])).content
+    )
+    return clean_journal_entry(raw)
+
+def generate_followup_questions(entry: str, llm: Optional[ChatOpenAI] = None,
+                                cache: Optional[GenerationCache] = None) -> Dict[str, List[str]]:
+    """Generate follow-up questions for a journal entry.
+
+    Errors are retried and raised as in generate_journal_entry_from_event.
+
+    Args:
+        entry: Journal entry text.
+        llm: Client to use; a new one is created if omitted.
+        cache: Generation cache to read from and write to.
+
+    Returns:
+        Dictionary containing follow-up questions.
+    """
+    llm = llm or create_client_for(cache)
+    prompt = followup_questions_prompt(entry)
+    questions_llm = llm.with_structured_output(JournalingQuestions)
+    questions = cached_generation(
+        cache, "followup_questions", prompt, llm,
+        lambda: call_with_retry_sync(lambda: questions_llm.invoke(prompt)).model_dump()
+    )
+
+    logging.info(f"Successfully generated follow-up questions")
+    return questions
+
+def generate_entry_and_questions(life_event: str, llm: Optional[ChatOpenAI] = None,
+                                 cache: Optional[GenerationCache] = None) -> Dict[str, Any]:
+    """Generate a journal entry and its follow-up questions in a single structured call.
+
+    Args:
+        life_event: Description of a life event.
+        llm: Client to use; a new one is created if omitted.
+        cache: Generation cache to read from and write to.
+
+    Returns:
+        Dictionary with the entry as "input" and the questions under "output", as in two-call mode.
+    """
+    llm = llm or create_client_for(cache)
+    prompt = fused_prompt(life_event)
+    fused_llm = llm.with_structured_output(JournalEntryWithQuestions)
+    result = cached_generation(
+        cache, "fused_entry_questions", prompt, llm,
+        lambda: call_with_retry_sync(lambda: fused_llm.invoke(prompt)).model_dump()
+    )
+    return fused_record(result)
+
+def fused_record(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Reshape a JournalEntryWithQuestions result into the record format."""
+    return {
+        "input": clean_journal_entry(result["entry"]),
+        "output": {"questions": result["questions"]}
+    }
+
+def process_single_event(event: str, llm: Optional[ChatOpenAI] = None,
+                         cache: Optional[GenerationCache] = None,
+                         mode: str = DEFAULT_GENERATION_MODE) -> Dict[str, Any]:
     """Process a single life event to generate a journal entry and follow-up questions.
-    
+
     Args:
         event: Description of a life event.
-        
+        llm: Client to use for both calls; a new one is created if omitted.
+        cache: Generation cache to read from and write to.
+        mode: TWO_CALL_MODE or FUSED_MODE.
+
     Returns:
-        Dictionary containing the journal entry and follow-up questions.
+        Dictionary containing the journal entry and follow-up questions, or a
+        record marked "fallback": True if generation failed.
     """
     try:
+        llm = llm or create_client_for(cache)
+
+        if mode == FUSED_MODE:
+            return generate_entry_and_questions(event, llm, cache)
+
         # Generate journal entry
-        entry = generate_journal_entry_from_event(event)
-        
+        entry = generate_journal_entry_from_event(event, llm, cache)
+
         # Generate follow-up questions
-        questions = generate_followup_questions(entry)
-        
+        questions = generate_followup_questions(entry, llm, cache)
+
         return {
             "input": entry,
             "output": questions
@@ -130,62 +295,310 @@ def process_single_event(event: str) -> Dict[str, Any]:
     except Exception as e:
         logging.error(f"Error processing event '{event}': {e}")
         # Return default entry and questions on error
+        return fallback_record(event, str(e))
+
+def classify_error(error: Exception) -> Optional[str]:
+    """Classify an API error as "rate_limit", "transient" or None when retrying won't help."""
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    name = type(error).__name__
+    if status == 429 or name == "RateLimitError":
+        # An exhausted quota is also reported as 429 but never recovers by waiting
+        if getattr(error, "code", None) == "insufficient_quota":
+            return None
+        return "rate_limit"
+    if status in TRANSIENT_STATUS_CODES or name in TRANSIENT_ERROR_NAMES:
+        return "transient"
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return "transient"
+    return None
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Read the Retry-After header of an API error, if the provider sent one."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit for calls to a rate-limited provider.
+
+    Every successful call grows the limit by about one per window of calls
+    (additive increase). A 429 halves it, and a call much slower than the usual
+    latency for its kind trims it by 10% (multiplicative decrease). The usual
+    latency is an exponentially weighted average kept per kind of call, since a
+    structured questions call is normally much slower than an entry call.
+    Decreases are applied at most once per cooldown, so a burst of 429s from the
+    same overloaded moment only counts once.
+    """
+
+    def __init__(self, initial: int, min_limit: int = 1, max_limit: int = MAX_CONCURRENCY,
+                 latency_factor: float = 3.0, cooldown: float = 2.0, latency_smoothing: float = 0.1):
+        self.min_limit = min_limit
+        self.max_limit = max(max_limit, initial)
+        self.limit = float(max(min_limit, initial))
+        self.latency_factor = latency_factor
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self.rate_limited = 0
+        self.latency_smoothing = latency_smoothing
+        self.baseline_latency: Dict[str, float] = {}
+        self._last_decrease = 0.0
+        self._condition = asyncio.Condition()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold one unit of concurrency for the duration of the block."""
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self.in_flight -= 1
+                self._condition.notify_all()
+
+    def on_success(self, latency: float, kind: str = "call") -> None:
+        """Record a successful call and its latency.
+
+        Args:
+            latency: Seconds the call took.
+            kind: Kind of call; latencies are only compared within a kind.
+        """
+        baseline = self.baseline_latency.get(kind)
+        if baseline is not None and latency > baseline * self.latency_factor:
+            self._decrease(0.9, f"{kind} latency {latency:.1f}s")
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        if baseline is None:
+            self.baseline_latency[kind] = latency
+        else:
+            self.baseline_latency[kind] = baseline + self.latency_smoothing * (latency - baseline)
+
+    def on_rate_limit(self) -> None:
+        """Record a 429 from the provider."""
+        self.rate_limited += 1
+        self._decrease(0.5, "rate limited")
+
+    def _decrease(self, factor: float, reason: str) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        previous = int(self.limit)
+        self.limit = max(self.min_limit, self.limit * factor)
+        if int(self.limit) != previous:
+            logging.warning(f"Concurrency {previous} -> {int(self.limit)} ({reason})")
+
+def retry_delay(error: Exception, attempt: int) -> float:
+    """Seconds to wait before retrying after `error` on the given attempt (0-based)."""
+    # Full jitter keeps retries from many events from arriving in lockstep
+    return retry_after_seconds(error) or random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+def call_with_retry_sync(call: Callable[[], Any], max_retries: int = MAX_RETRIES) -> Any:
+    """Blocking version of call_with_retry, for the synchronous generation path.
+
+    Args:
+        call: Function making the API call.
+        max_retries: Retries before the last error is raised.
+
+    Returns:
+        The result of the call.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return call()
+        except Exception as e:
+            kind = classify_error(e)
+            if kind is None or attempt == max_retries:
+                raise
+            delay = retry_delay(e, attempt)
+            logging.warning(f"{kind} error ({e}); retry {attempt + 1}/{max_retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+async def call_with_retry(call: Callable[[], Awaitable[Any]], limiter: AdaptiveLimiter,
+                          kind: str = "call", max_retries: int = MAX_RETRIES) -> Any:
+    """Run an API call, retrying rate-limited and transient failures with jittered exponential backoff.
+
+    Args:
+        call: Function returning a fresh awaitable for each attempt.
+        limiter: Limiter that is told about latencies and 429s.
+        kind: Kind of call, so the limiter compares its latency with calls of the same kind.
+        max_retries: Retries before the last error is raised.
+
+    Returns:
+        The result of the call.
+    """
+    for attempt in range(max_retries + 1):
+        start = time.monotonic()
+        try:
+            result = await call()
+        except Exception as e:
+            error_kind = classify_error(e)
+            if error_kind is None or attempt == max_retries:
+                raise
+            if error_kind == "rate_limit":
+                limiter.on_rate_limit()
+            delay = retry_delay(e, attempt)
+            logging.warning(f"{error_kind} error ({e}); retry {attempt + 1}/{max_retries} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+        else:
+            limiter.on_success(time.monotonic() - start, kind)
+            return result
+
+async def agenerate_journal_entry_from_event(life_event: str, llm: ChatOpenAI, limiter: AdaptiveLimiter,
+                                             cache: Optional[GenerationCache] = None) -> str:
+    """Async version of generate_journal_entry_from_event."""
+    prompt = journal_entry_prompt(life_event)
+
+    async def generate() -> str:
+        response = await call_with_retry(lambda: llm.ainvoke([HumanMessage(content=prompt)]), limiter, "journal_entry")
+        return response.content
+
+    return clean_journal_entry(await acached_generation(cache, "journal_entry", prompt, llm, generate))
+
+async def agenerate_followup_questions(entry: str, llm: ChatOpenAI, limiter: AdaptiveLimiter,
+                                       cache: Optional[GenerationCache] = None,
+                                       questions_llm=None) -> Dict[str, List[str]]:
+    """Async version of generate_followup_questions.
+
+    Args:
+        entry: Journal entry text.
+        llm: Shared client; its model and temperature key the cache.
+        limiter: Limiter that is told about latencies and 429s.
+        cache: Generation cache to read from and write to.
+        questions_llm: `llm` already bound to the JournalingQuestions schema, to avoid rebinding per call.
+
+    Returns:
+        Dictionary containing follow-up questions.
+    """
+    prompt = followup_questions_prompt(entry)
+    questions_llm = questions_llm or llm.with_structured_output(JournalingQuestions)
+
+    async def generate() -> Dict[str, List[str]]:
+        result = await call_with_retry(lambda: questions_llm.ainvoke(prompt), limiter, "followup_questions")
+        return result.model_dump()
+
+    return await acached_generation(cache, "followup_questions", prompt, llm, generate)
+
+async def agenerate_entry_and_questions(life_event: str, llm: ChatOpenAI, limiter: AdaptiveLimiter,
+                                       cache: Optional[GenerationCache] = None,
+                                       fused_llm=None) -> Dict[str, Any]:
+    """Async version of generate_entry_and_questions.
+
+    Args:
+        life_event: Description of a life event.
+        llm: Shared client; its model and temperature key the cache.
+        limiter: Limiter that is told about latencies and 429s.
+        cache: Generation cache to read from and write to.
+        fused_llm: `llm` already bound to the JournalEntryWithQuestions schema.
+
+    Returns:
+        Dictionary with the entry as "input" and the questions under "output".
+    """
+    prompt = fused_prompt(life_event)
+    fused_llm = fused_llm or llm.with_structured_output(JournalEntryWithQuestions)
+
+    async def generate() -> Dict[str, Any]:
+        result = await call_with_retry(lambda: fused_llm.ainvoke(prompt), limiter, "fused_entry_questions")
+        return result.model_dump()
+
+    return fused_record(await acached_generation(cache, "fused_entry_questions", prompt, llm, generate))
+
+async def aprocess_single_event(event: str, llm: ChatOpenAI, structured_llm, limiter: AdaptiveLimiter,
+                                cache: Optional[GenerationCache] = None,
+                                mode: str = DEFAULT_GENERATION_MODE) -> Dict[str, Any]:
+    """Async version of process_single_event; returns a marked fallback record once retries run out.
+
+    `structured_llm` is `llm` bound to the schema of the mode: JournalingQuestions
+    for two calls, JournalEntryWithQuestions for fused.
+    """
+    try:
+        async with limiter.slot():
+            if mode == FUSED_MODE:
+                return await agenerate_entry_and_questions(event, llm, limiter, cache, structured_llm)
+            entry = await agenerate_journal_entry_from_event(event, llm, limiter, cache)
+            questions = await agenerate_followup_questions(entry, llm, limiter, cache, structured_llm)
         return {
-            "input": f"Today I experienced {event}. It was a significant moment in my life that made me reflect on my journey.",
-            "output": {
-                "questions": [
-                    "How did this experience make you feel?",
-                    "What thoughts came up for you during this moment?",
-                    "How does this connect to your broader life patterns?",
-                    "What might this experience be teaching you?",
-                    "How might you approach similar situations in the future?"
-                ]
-            }
+            "input": entry,
+            "output": questions
         }
+    except Exception as e:
+        logging.error(f"Error processing event '{event}': {e}")
+        return fallback_record(event, str(e))
+
+async def stream_entries_and_questions(
+    events: List[str],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    llm: Optional[ChatOpenAI] = None,
+    max_concurrency: int = MAX_CONCURRENCY,
+    cache: Optional[GenerationCache] = None,
+    mode: str = DEFAULT_GENERATION_MODE
+) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """Generate records for life events concurrently, yielding each as soon as it is ready.
+
+    One client is shared by every call. An AdaptiveLimiter starts at `concurrency`
+    events in flight and moves between 1 and `max_concurrency` as the provider
+    allows. Records come back in completion order, so a slow event never holds
+    back the ones behind it. Events that still fail after retries yield a record
+    with "fallback": True.
+
+    Args:
+        events: List of life event descriptions.
+        concurrency: Number of events processed at the same time to start with.
+        llm: Client to share; created with create_client_for(cache) if omitted.
+        max_concurrency: Upper bound for the adaptive limit.
+        cache: Generation cache; cached prompts are answered without calling the model.
+        mode: TWO_CALL_MODE, or FUSED_MODE to get each entry and its questions in one call.
 
-def batch_generate_entries_and_questions(events: List[str]) -> List[Dict[str, Any]]:
+    Yields:
+        (event, record) tuples in completion order.
+    """
+    llm = llm or create_client_for(cache)
+    if mode not in (TWO_CALL_MODE, FUSED_MODE):
+        raise ValueError(f"Unknown generation mode '{mode}'")
+    structured_llm = llm.with_structured_output(JournalEntryWithQuestions if mode == FUSED_MODE else JournalingQuestions)
+    limiter = AdaptiveLimiter(concurrency, max_limit=max_concurrency)
+
+    tasks = [asyncio.ensure_future(aprocess_single_event(event, llm, structured_llm, limiter, cache, mode)) for event in events]
+
+    async def paired(event: str, task: "asyncio.Future[Dict[str, Any]]") -> Tuple[str, Dict[str, Any]]:
+        return event, await task
+
+    try:
+        for next_done in asyncio.as_completed([paired(event, task) for event, task in zip(events, tasks)]):
+            yield await next_done
+    finally:
+        # The consumer stopped early: don't leave calls running in the background
+        for task in tasks:
+            task.cancel()
+        logging.info(f"Final concurrency {int(limiter.limit)}, {limiter.rate_limited} rate-limited calls")
+
+def batch_generate_entries_and_questions(events: List[str], concurrency: int = DEFAULT_CONCURRENCY,
+                                         mode: str = DEFAULT_GENERATION_MODE) -> List[Dict[str, Any]]:
     """Generate journal entries and follow-up questions for a batch of life events.
-    
-    This function processes multiple events in parallel using ThreadPoolExecutor
-    to improve efficiency when making multiple API calls.
-    
+
+    Synchronous wrapper around stream_entries_and_questions for callers that
+    want the whole batch at once. Results are in completion order.
+
     Args:
         events: List of life event descriptions.
-        
+        concurrency: Maximum number of events processed at the same time.
+        mode: TWO_CALL_MODE or FUSED_MODE.
+
     Returns:
         List of dictionaries containing journal entries and follow-up questions.
     """
-    results = []
-    
+    async def collect() -> List[Dict[str, Any]]:
+        results = []
+        async for event, record in stream_entries_and_questions(events, concurrency, mode=mode):
+            logging.info(f"Completed processing event: {event[:30]}...")
+            results.append(record)
+        return results
+
     try:
-        # Process events in parallel using ThreadPoolExecutor
-        with ThreadPoolExecutor(max_workers=5) as executor:
-            # Submit all tasks
-            future_to_event = {executor.submit(process_single_event, event): event for event in events}
-            
-            # Collect results as they complete
-            for future in future_to_event:
-                try:
-                    result = future.result()
-                    results.append(result)
-                    logging.info(f"Completed processing event: {future_to_event[future][:30]}...")
-                except Exception as e:
-                    event = future_to_event[future]
-                    logging.error(f"Error in thread processing event '{event}': {e}")
-                    # Add default entry on error
-                    results.append({
-                        "input": f"Today I experienced {event}. It was a significant moment in my life that made me reflect on my journey.",
-                        "output": {
-                            "questions": [
-                                "How did this experience make you feel?",
-                                "What thoughts came up for you during this moment?",
-                                "How does this connect to your broader life patterns?",
-                                "What might this experience be teaching you?",
-                                "How might you approach similar situations in the future?"
-                            ]
-                        }
-                    })
+        return asyncio.run(collect())
     except Exception as e:
         logging.error(f"Error in batch processing: {e}")
-    
-    return results
+        return []